@@ -3,6 +3,7 @@ from flask import Flask, render_template
 from flask_login import current_user
 from config import config
 from models import db, login_manager
+from models.route import add_polyline_column
 from flask_session import Session
 import datetime
 
@@ -62,6 +63,8 @@ def create_app(config_name='default'):
     # Create all tables
     with app.app_context():
         db.create_all()
+        if add_polyline_column():
+            app.logger.info("Added column routes.polyline_e6; run migrate_polylines.py to convert existing routes")
     @app.context_processor
     def inject_now():
         """Add current datetime to all templates."""
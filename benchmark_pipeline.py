@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Time the directions and CSV analysis pipelines without network access.
+
+API calls are answered by the offline transport in utils/api_transport.py:
+'synthesize' (default) generates responses for any coordinates, 'replay'
+serves responses saved by an earlier run with API_TRANSPORT=record.
+Simulated latency per call is set with --latency-ms/--jitter-ms. The
+Google Maps and weather caches and the rate limiter are disabled so every
+run measures the full pipeline.
+
+Usage: python benchmark_pipeline.py [--mode synthesize|replay] [--routes N]
+                                    [--latency-ms MS] [--jitter-ms MS]
+                                    [--processing-mode fast|standard|detailed]
+"""
+import os
+import csv
+import math
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mode', choices=['synthesize', 'replay'], default='synthesize')
+    parser.add_argument('--routes', type=int, default=5, help='routes to analyze per pipeline')
+    parser.add_argument('--latency-ms', type=float, default=80, help='simulated latency per API call')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='latency varies by up to this much')
+    parser.add_argument('--processing-mode', default='standard', help='CSV processing mode')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+def summarize(name, timings, calls):
+    """Print timing statistics and API call counts for one pipeline"""
+    print(f"\n{name}: {len(timings)} routes")
+    print(f"  mean {statistics.mean(timings):.2f}s  median {statistics.median(timings):.2f}s  max {max(timings):.2f}s")
+    print(f"  API calls: " + ', '.join(f"{endpoint}={count}" for endpoint, count in sorted(calls.items())))
+
+def random_pairs(count, seed):
+    """Origin/destination coordinate pairs 20-150 km apart"""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        lat, lng = rng.uniform(12.0, 28.0), rng.uniform(73.0, 86.0)
+        bearing = rng.uniform(0, 360)
+        reach = rng.uniform(0.2, 1.3)
+        pairs.append(((round(lat, 5), round(lng, 5)),
+                      (round(lat + reach * math.cos(math.radians(bearing)), 5),
+                       round(lng + reach * math.sin(math.radians(bearing)), 5))))
+    return pairs
+
+def benchmark_directions(app, pairs, session):
+    """POST each pair to route_controller.index and time it"""
+    from models import db, User
+    
+    with app.app_context():
+        user = User.query.filter_by(username='benchmark').first()
+        if user is None:
+            user = User(username='benchmark', email='benchmark@example.com', password='benchmark')
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+    
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['_user_id'] = str(user_id)
+        flask_session['_fresh'] = True
+    
+    session.calls.clear()
+    timings = []
+    for (from_lat, from_lng), (to_lat, to_lng) in pairs:
+        start = time.perf_counter()
+        response = client.post('/routes/', data={
+            'input_type': 'coordinates',
+            'from_lat': from_lat, 'from_lng': from_lng,
+            'to_lat': to_lat, 'to_lng': to_lng,
+            'vehicle_type': 'heavy_truck'
+        })
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 302:
+            print(f"  route {from_lat},{from_lng} -> {to_lat},{to_lng} did not complete (HTTP {response.status_code})")
+    
+    summarize('Directions pipeline (route_controller.index)', timings, session.calls)
+
+def write_route_csv(path, points, rng):
+    """Write points as a GPS trace, densified and with a little noise"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['latitude', 'longitude'])
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+            for step in range(5):
+                t = step / 5
+                writer.writerow([round(lat1 + t * (lat2 - lat1) + rng.gauss(0, 0.00005), 6),
+                                 round(lng1 + t * (lng2 - lng1) + rng.gauss(0, 0.00005), 6)])
+
+def benchmark_csv(app, pairs, session, processing_mode, seed):
+    """Run CSVRouteAnalyzer.process_csv_route on a synthetic trace per pair"""
+    import polyline
+    from utils.api_transport import ResponseSynthesizer
+    from utils.csv_route_analyzer import CSVRouteAnalyzer
+    
+    analyzer = CSVRouteAnalyzer()
+    config = analyzer.build_config(processing_mode)
+    synthesizer = ResponseSynthesizer()
+    rng = random.Random(seed)
+    
+    session.calls.clear()
+    timings = []
+    with tempfile.TemporaryDirectory() as directory, app.app_context():
+        for index, (origin, destination) in enumerate(pairs):
+            route = synthesizer.directions({
+                'origin': f"{origin[0]},{origin[1]}", 'destination': f"{destination[0]},{destination[1]}"
+            })['routes'][0]
+            points = polyline.decode(route['overview_polyline']['points'])
+            path = os.path.join(directory, f"route_{index}.csv")
+            write_route_csv(path, points, rng)
+            
+            bounds = {'from_lat': origin[0], 'from_lng': origin[1], 'to_lat': destination[0], 'to_lng': destination[1],
+                      'filter_mode': 'corridor', 'corridor_width_m': 20000}
+            start = time.perf_counter()
+            result = analyzer.process_csv_route(
+                path, bounds, 'heavy_truck', app.config['GOOGLE_MAPS_API_KEY'], config=config,
+                weather_api_key=app.config['OPENWEATHER_API_KEY']
+            )
+            timings.append(time.perf_counter() - start)
+            if not result['success']:
+                print(f"  CSV route {index} failed: {result['error']}")
+    
+    summarize(f"CSV pipeline (process_csv_route, {processing_mode})", timings, session.calls)
+
+if __name__ == "__main__":
+    args = parse_args()
+    
+    # Settings are read when the config is imported
+    os.environ['API_TRANSPORT'] = args.mode
+    os.environ['API_TRANSPORT_LATENCY_MS'] = str(args.latency_ms)
+    os.environ['API_TRANSPORT_JITTER_MS'] = str(args.jitter_ms)
+    os.environ['GMAPS_CACHE_ENABLED'] = 'False'
+    os.environ['WEATHER_CACHE_ENABLED'] = 'False'
+    os.environ.setdefault('FLASK_ENV', 'testing')
+    
+    from app import create_app
+    from utils.api_transport import get_transport_session
+    
+    app = create_app('testing')
+    app.config['API_CALLS_PER_MINUTE'] = dict.fromkeys(app.config['API_CALLS_PER_MINUTE'], 1000000)
+    with app.app_context():
+        session = get_transport_session()
+    
+    pairs = random_pairs(args.routes, args.seed)
+    print(f"Transport: {args.mode}, latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms per call")
+    
+    benchmark_directions(app, pairs, session)
+    benchmark_csv(app, pairs, session, args.processing_mode, args.seed)
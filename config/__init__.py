@@ -0,0 +1,140 @@
+import os
+from dotenv import load_dotenv
+from .processing_config import API_RATE_LIMITS
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Project root (this package lives in <root>/config)
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Config:
+    """Base configuration class for the application."""
+    # Application settings
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-key-should-be-changed-in-production')
+    DEBUG = os.getenv('DEBUG', 'False').lower() in ('true', 't', '1', 'yes', 'y')
+    
+    # Database configuration - SQLite by default
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///route_analytics.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # MongoDB configuration (optional)
+    MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/route_analytics')
+    
+    # API keys
+    GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
+    OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
+    
+    # OpenWeather request timeouts in seconds (see utils/weather.py)
+    WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', 3.05))
+    WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', 10))
+    
+    # File upload settings
+    UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload size
+    
+    # PDF reports settings
+    REPORTS_FOLDER = os.path.join(basedir, 'static', 'reports')
+    
+    # Local caches shared by all workers on the host
+    CACHE_FOLDER = os.getenv('CACHE_FOLDER', os.path.join(basedir, 'cache'))
+    ANALYSIS_CACHE_PATH = os.path.join(CACHE_FOLDER, 'analysis_cache.db')
+    ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 24 * 3600))  # 1 week
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 500))
+    ANALYSIS_WEATHER_TTL = int(os.getenv('ANALYSIS_WEATHER_TTL', 30 * 60))  # 30 minutes
+    
+    # Google Maps API responses (see utils/gmaps_cache.py)
+    GMAPS_CACHE_ENABLED = os.getenv('GMAPS_CACHE_ENABLED', 'True').lower() in ('true', 't', '1', 'yes', 'y')
+    GMAPS_CACHE_PATH = os.path.join(CACHE_FOLDER, 'gmaps_cache.db')
+    GMAPS_CACHE_MAX_ENTRIES = int(os.getenv('GMAPS_CACHE_MAX_ENTRIES', 200000))
+    
+    # Weather observations shared by geohash cell and time bucket (see utils/weather.py);
+    # precision 4 cells are about 39 x 20 km
+    WEATHER_CACHE_ENABLED = os.getenv('WEATHER_CACHE_ENABLED', 'True').lower() in ('true', 't', '1', 'yes', 'y')
+    WEATHER_CACHE_PATH = os.path.join(CACHE_FOLDER, 'weather_cache.db')
+    WEATHER_CACHE_GEOHASH_PRECISION = int(os.getenv('WEATHER_CACHE_GEOHASH_PRECISION', 4))
+    WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 30 * 60))  # 30 minutes
+    WEATHER_CACHE_MAX_ENTRIES = int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 50000))
+    
+    # Static Maps and Street View images used in PDF reports (see utils/image_cache.py)
+    PDF_IMAGE_CACHE_ENABLED = os.getenv('PDF_IMAGE_CACHE_ENABLED', 'True').lower() in ('true', 't', '1', 'yes', 'y')
+    PDF_IMAGE_CACHE_DIR = os.path.join(CACHE_FOLDER, 'pdf_images')
+    PDF_IMAGE_CACHE_MAX_MB = int(os.getenv('PDF_IMAGE_CACHE_MAX_MB', 256))
+    
+    # Places searches along directions routes cover this far either side of
+    # the route, with search circles of at most this radius (see utils/poi_fetcher.py)
+    POI_CORRIDOR_WIDTH_M = float(os.getenv('POI_CORRIDOR_WIDTH_M', 2000))
+    POI_SEARCH_MAX_RADIUS_M = float(os.getenv('POI_SEARCH_MAX_RADIUS_M', 5000))
+    
+    # Google and OpenWeather call limits per API, shared by all workers (see
+    # utils/rate_limit.py); set API_CALLS_PER_MINUTE_<API> to your project's quotas
+    API_RATE_LIMIT_PATH = os.path.join(CACHE_FOLDER, 'rate_limit.db')
+    API_CALLS_PER_MINUTE = {
+        api: int(os.getenv(f'API_CALLS_PER_MINUTE_{api.upper()}', rate)) for api, rate in API_RATE_LIMITS.items()
+    }
+    
+    # How API requests are sent: live, record, replay or synthesize (see utils/api_transport.py)
+    API_TRANSPORT = os.getenv('API_TRANSPORT', 'live')
+    API_TRANSPORT_DIR = os.getenv('API_TRANSPORT_DIR', os.path.join(CACHE_FOLDER, 'api_recordings'))
+    API_TRANSPORT_LATENCY_MS = float(os.getenv('API_TRANSPORT_LATENCY_MS', 0))
+    API_TRANSPORT_JITTER_MS = float(os.getenv('API_TRANSPORT_JITTER_MS', 0))
+    
+    # Background CSV analysis jobs
+    JOB_QUEUE_PATH = os.path.join(CACHE_FOLDER, 'jobs.db')
+    CSV_JOB_WORKERS = int(os.getenv('CSV_JOB_WORKERS', 2))
+    CSV_JOB_RETENTION = int(os.getenv('CSV_JOB_RETENTION', 24 * 3600))  # Finished jobs kept for 1 day
+    
+    # Session settings
+    SESSION_TYPE = 'filesystem'
+    SESSION_PERMANENT = False
+    PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    
+    # Create necessary directories
+    @staticmethod
+    def init_app(app):
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['REPORTS_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['CACHE_FOLDER'], exist_ok=True)
+        os.makedirs('compliance_data', exist_ok=True)
+        os.makedirs('environmental_data', exist_ok=True)
+        os.makedirs('logs', exist_ok=True)
+
+class DevelopmentConfig(Config):
+    """Development configuration."""
+    DEBUG = True
+    
+class TestingConfig(Config):
+    """Testing configuration."""
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    
+class ProductionConfig(Config):
+    """Production configuration."""
+    DEBUG = False
+    
+    @classmethod
+    def init_app(cls, app):
+        Config.init_app(app)
+        
+        # Production specific setup
+        import logging
+        from logging.handlers import RotatingFileHandler
+        
+        # Set up logging
+        file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+        ))
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.setLevel(logging.INFO)
+        app.logger.info('Route Analytics startup')
+
+# Configuration dictionary
+config = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+    'default': DevelopmentConfig
+}
\ No newline at end of file
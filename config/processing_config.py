@@ -2,15 +2,16 @@
 """
 Configuration settings for CSV route processing optimization
 """
+import math
 
 # Processing modes configuration
 PROCESSING_MODES = {
     'fast': {
         'max_points_for_analysis': 250,
         'poi_search_points': 3,
-        'elevation_sample_points': 10,
+        'elevation_sample_points': 256,
         'weather_sample_points': 2,
-        'sharp_turn_sample_interval': 10,
+        'turn_spacing_m': 25,
         'enable_parallel_processing': True,
         'skip_environmental_analysis': True,
         'skip_detailed_compliance': True,
@@ -19,9 +20,9 @@ PROCESSING_MODES = {
     'standard': {
         'max_points_for_analysis': 500,
         'poi_search_points': 5,
-        'elevation_sample_points': 20,
+        'elevation_sample_points': 512,
         'weather_sample_points': 3,
-        'sharp_turn_sample_interval': 5,
+        'turn_spacing_m': 15,
         'enable_parallel_processing': True,
         'skip_environmental_analysis': False,
         'skip_detailed_compliance': False,
@@ -30,9 +31,9 @@ PROCESSING_MODES = {
     'detailed': {
         'max_points_for_analysis': 1000,
         'poi_search_points': 8,
-        'elevation_sample_points': 50,
+        'elevation_sample_points': 1024,
         'weather_sample_points': 5,
-        'sharp_turn_sample_interval': 3,
+        'turn_spacing_m': 10,
         'enable_parallel_processing': True,
         'skip_environmental_analysis': False,
         'skip_detailed_compliance': False,
@@ -48,10 +49,22 @@ MAX_POINTS_ERROR = 10000
 # Database storage limits
 MAX_POINTS_STORED = 1000
 MAX_SHARP_TURNS_STORED = 50
+MAX_ELEVATION_POINTS_STORED = 500
 MAX_RISK_SEGMENTS_STORED = 20
 
 # API rate limiting
-MAX_API_CALLS_PER_MINUTE = 100
+MAX_API_CALLS_PER_MINUTE = 100  # APIs without an entry below
+
+# Calls per minute for each API, from the providers' standard quotas
+API_RATE_LIMITS = {
+    'directions': 3000,
+    'elevation': 3000,
+    'geocode': 3000,
+    'places': 600,
+    'static_maps': 30000,
+    'street_view': 30000,
+    'openweather': 60  # Free plan
+}
 API_RETRY_ATTEMPTS = 3
 API_RETRY_DELAY = 1  # seconds
 
@@ -104,7 +117,7 @@ def estimate_processing_time(total_points, mode='standard'):
     
     # Add API call overhead
     api_calls = (config['poi_search_points'] * 5 +  # POI searches
-                config['elevation_sample_points'] +   # Elevation calls
+                math.ceil(config['elevation_sample_points'] / 512) +  # Elevation calls (512 locations each)
                 config['weather_sample_points'])      # Weather calls
     
     api_overhead = api_calls * 0.5  # 0.5 seconds per API call
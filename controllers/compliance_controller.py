@@ -38,8 +38,7 @@ def compliance_analysis(route_id):
         # If compliance data not in route_data, generate it now
         try:
             # Get route polyline
-            if route.polyline:
-                polyline = json.loads(route.polyline)
+            polyline = route.get_polyline_array()
             
             # Check vehicle compliance
             vehicle_compliance = compliance_checker.check_vehicle_compliance(route.vehicle_type)
@@ -85,7 +84,8 @@ def compliance_analysis(route_id):
             
             # Generate rest stop recommendations
             rest_stops = compliance_checker.generate_rest_stop_recommendations(
-                polyline, route.duration_value, poi_data, route.vehicle_type
+                polyline, route.duration_value, poi_data, route.vehicle_type,
+                places=route_data.get('places')
             )
         except Exception as e:
             current_app.logger.error(f"Error generating rest stops: {e}")
@@ -137,12 +137,13 @@ def rest_stop_recommendations(route_id):
     }
     
     # Get polyline
-    polyline = json.loads(route.polyline) if route.polyline else []
+    polyline = route.get_polyline()
     
     # Generate rest stop recommendations
     try:
         rest_stops = compliance_checker.generate_rest_stop_recommendations(
-            polyline, route.duration_value, poi_data, route.vehicle_type
+            polyline, route.duration_value, poi_data, route.vehicle_type,
+            places=route_data.get('places')
         )
         
         return jsonify({
@@ -168,7 +169,7 @@ def restricted_zones_map(route_id):
     
     # Get route data
     route_data = route.get_route_data()
-    polyline = json.loads(route.polyline) if route.polyline else []
+    polyline = route.get_polyline()
     
     # Get restricted zones
     restricted_zones = []
@@ -2,12 +2,12 @@
 import os
 import pandas as pd
 import numpy as np
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, make_response, session
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import FloatField, StringField, SelectField, SubmitField
-from wtforms.validators import DataRequired, NumberRange
+from wtforms.validators import DataRequired, Optional, NumberRange, ValidationError
 from werkzeug.utils import secure_filename
 from models import db, Route
 import json
@@ -17,6 +17,7 @@ import uuid
 import time
 import io
 import csv
+import math
 import logging
 
 # Import existing utility functions
@@ -26,6 +27,11 @@ from utils.emergency import categorize_emergency_services, find_critical_emergen
 from utils.environmental import EnvironmentalAnalyzer
 from utils.elevation import get_elevation_data
 from utils.csv_route_analyzer import CSVRouteAnalyzer  # Optimized analyzer
+from utils.geo import path_length_m
+from utils.cache import SQLiteCache
+from utils.job_queue import JobQueue
+from utils.spatial_filter import DEFAULT_CORRIDOR_WIDTH_M, FILTER_MODES, parse_polygon
+from config.processing_config import MAX_ELEVATION_POINTS_STORED
 
 # Create blueprint
 csv_upload_bp = Blueprint('csv_upload_bp', __name__)
@@ -38,6 +44,14 @@ csv_analyzer = CSVRouteAnalyzer()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Settings the processing-config endpoint saves: request field -> (config key, parser)
+PROCESSING_OVERRIDE_FIELDS = {
+    'max_points': ('max_points_for_analysis', lambda value: None if value == 'all' else int(value)),
+    'poi_points': ('poi_search_points', int),
+    'elevation_points': ('elevation_sample_points', int),
+    'parallel_processing': ('enable_parallel_processing', bool)
+}
+
 class CSVUploadForm(FlaskForm):
     """Form for CSV route upload and analysis - with optimization options"""
     csv_file = FileField('Route CSV File', validators=[
@@ -63,6 +77,19 @@ class CSVUploadForm(FlaskForm):
         NumberRange(-180, 180, message="Longitude must be between -180 and 180")
     ])
     
+    # How the points are selected: the box between the corners, a polygon,
+    # or a corridor around the from->to line
+    filter_mode = SelectField('Filter Area', choices=[
+        ('bbox', 'Bounding box'),
+        ('corridor', 'Corridor along From -> To'),
+        ('polygon', 'Polygon')
+    ], default='bbox')
+    corridor_width_km = FloatField('Corridor Half-Width (km)', default=DEFAULT_CORRIDOR_WIDTH_M / 1000, validators=[
+        Optional(),
+        NumberRange(0.05, 100, message="Corridor width must be between 0.05 and 100 km")
+    ])
+    polygon = StringField('Polygon Vertices (lat,lng; lat,lng; ...)')
+    
     route_name = StringField('Route Name (Optional)')
     vehicle_type = SelectField('Vehicle Type', choices=[
         ('car', 'Car'),
@@ -87,6 +114,40 @@ class CSVUploadForm(FlaskForm):
     ], default='500')
     
     submit = SubmitField('Upload and Analyze Route')
+    
+    def validate_polygon(self, field):
+        if self.filter_mode.data == 'polygon':
+            try:
+                parse_polygon(field.data)
+            except ValueError as e:
+                raise ValidationError(str(e))
+
+def parse_bounds(data):
+    """
+    Build the bounds dict used for filtering from form or JSON values
+    
+    Raises:
+        KeyError, ValueError: If a required value is missing or invalid
+    """
+    bounds = {
+        'from_lat': float(data['from_lat']),
+        'from_lng': float(data['from_lng']),
+        'to_lat': float(data['to_lat']),
+        'to_lng': float(data['to_lng'])
+    }
+    
+    filter_mode = data.get('filter_mode') or 'bbox'
+    if filter_mode not in FILTER_MODES:
+        raise ValueError(f"Unknown filter mode: {filter_mode}")
+    
+    if filter_mode == 'corridor':
+        bounds['filter_mode'] = filter_mode
+        bounds['corridor_width_m'] = float(data.get('corridor_width_km') or DEFAULT_CORRIDOR_WIDTH_M / 1000) * 1000
+    elif filter_mode == 'polygon':
+        bounds['filter_mode'] = filter_mode
+        bounds['polygon'] = parse_polygon(data.get('polygon'))
+    
+    return bounds
 
 @csv_upload_bp.route('/', methods=['GET', 'POST'])
 @login_required
@@ -95,7 +156,6 @@ def upload_csv():
     form = CSVUploadForm()
     
     if form.validate_on_submit():
-        start_time = time.time()
         file_path = None
         
         try:
@@ -115,16 +175,9 @@ def upload_csv():
                     os.remove(file_path)
                     return redirect(url_for('csv_upload_bp.upload_csv'))
                 
-                # Quick row count check
-                with open(file_path, 'r') as f:
-                    total_rows = sum(1 for line in f) - 1  # Subtract header
-                
-                if total_rows > 20000:
-                    flash(f'File too large ({total_rows:,} points). Please use a file with fewer than 20,000 points.', 'danger')
-                    os.remove(file_path)
-                    return redirect(url_for('csv_upload_bp.upload_csv'))
-                    
-                logger.info(f"Processing CSV with {total_rows:,} points")
+                # Rows are counted while the analyzer streams the file, so
+                # there is no separate counting pass or row ceiling here
+                logger.info(f"Processing CSV of {file_size / (1024 * 1024):.1f} MB")
                     
             except Exception as e:
                 flash(f'Error reading CSV file: {str(e)}', 'danger')
@@ -132,130 +185,166 @@ def upload_csv():
                 return redirect(url_for('csv_upload_bp.upload_csv'))
             
             # Extract form data
-            bounds = {
-                'from_lat': form.from_lat.data,
-                'from_lng': form.from_lng.data,
-                'to_lat': form.to_lat.data,
-                'to_lng': form.to_lng.data
-            }
+            bounds = parse_bounds({
+                field: getattr(form, field).data
+                for field in ('from_lat', 'from_lng', 'to_lat', 'to_lng',
+                              'filter_mode', 'corridor_width_km', 'polygon')
+            })
             
             vehicle_type = form.vehicle_type.data
             route_name = form.route_name.data or f"CSV Route {timestamp}"
             processing_mode = form.processing_mode.data
             max_points = form.max_points.data
             
-            # Configure CSV analyzer based on form selections
-            configure_analyzer(processing_mode, max_points)
-            
-            # Log processing configuration
+            # Build this upload's own frozen configuration from the form
+            # selections and any overrides saved through /api/processing-config
+            config = build_analysis_config(processing_mode, max_points)
             logger.info(f"Processing configuration: mode={processing_mode}, max_points={max_points}")
             
-            # Show processing start message
-            if total_rows > 1000:
-                flash(f'Processing large file ({total_rows:,} points). This may take several minutes...', 'info')
+            # Hand the analysis to the background job queue and return right away
+            task_id = get_job_queue().submit(
+                run_csv_analysis_job,
+                current_app._get_current_object(), current_user.id, file_path, bounds,
+                vehicle_type, route_name, processing_mode, max_points, config,
+                owner=current_user.id
+            )
+            logger.info(f"Queued CSV analysis task {task_id}")
             
-            # Process CSV and analyze route
-            try:
+            return redirect(url_for('csv_upload_bp.processing_page', task_id=task_id))
+            
+        except Exception as e:
+            logger.error(f"Unexpected error processing CSV route: {str(e)}")
+            flash(f'Unexpected error: {str(e)}. Please try again or contact support.', 'danger')
+            
+            # Clean up file if it exists
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+    
+    return render_template('csv_upload/upload.html', form=form, title="Upload CSV Route")
+
+def get_analysis_cache():
+    """Get the shared analysis cache for the current app"""
+    cache = current_app.extensions.get('csv_analysis_cache')
+    if cache is None:
+        cache = SQLiteCache(
+            current_app.config['ANALYSIS_CACHE_PATH'],
+            namespace='csv_analysis',
+            max_entries=current_app.config['ANALYSIS_CACHE_MAX_ENTRIES'],
+            default_ttl=current_app.config['ANALYSIS_CACHE_TTL']
+        )
+        current_app.extensions['csv_analysis_cache'] = cache
+    return cache
+
+def refresh_cached_weather(route_data, analysis_cache, cache_key, config):
+    """Re-fetch weather for a cached analysis once it is older than the weather TTL"""
+    fetched_at = route_data.get('weather_fetched_at', 0)
+    if time.time() - fetched_at < current_app.config['ANALYSIS_WEATHER_TTL']:
+        return
+    
+    logger.info(f"Refreshing stale weather for cached analysis {cache_key[:12]}")
+    route_data['weather'] = csv_analyzer.get_weather_optimized(
+        route_data.get('filtered_points', []), current_app.config['OPENWEATHER_API_KEY'], config
+    )
+    route_data['weather_fetched_at'] = time.time()
+    analysis_cache.set(cache_key, route_data)
+
+def get_job_queue():
+    """Get the background job queue for the current app"""
+    queue = current_app.extensions.get('csv_job_queue')
+    if queue is None:
+        queue = JobQueue(
+            current_app.config['JOB_QUEUE_PATH'],
+            max_workers=current_app.config['CSV_JOB_WORKERS'],
+            retention_seconds=current_app.config['CSV_JOB_RETENTION']
+        )
+        current_app.extensions['csv_job_queue'] = queue
+    return queue
+
+def run_csv_analysis_job(app, user_id, file_path, bounds, vehicle_type, route_name,
+                         processing_mode, max_points, config, progress=None):
+    """
+    Analyze an uploaded CSV and save the Route (runs on the job queue)
+    
+    Returns:
+        dict: route_id of the saved route and a summary message
+    
+    Raises:
+        ValueError: If the CSV cannot be analyzed
+    """
+    start_time = time.time()
+    
+    with app.app_context():
+        try:
+            # Serve repeat uploads of the same file and settings from the cache
+            analysis_cache = get_analysis_cache()
+            cache_key = csv_analyzer.analysis_cache_key(
+                file_path, bounds, vehicle_type, config
+            )
+            route_data = analysis_cache.get(cache_key)
+            
+            if route_data:
+                logger.info(f"Analysis cache hit for {cache_key[:12]}")
+                refresh_cached_weather(route_data, analysis_cache, cache_key, config)
+            else:
+                # Process CSV and analyze route
                 analysis_result = csv_analyzer.process_csv_route(
-                    file_path, bounds, vehicle_type, current_app.config['GOOGLE_MAPS_API_KEY']
+                    file_path, bounds, vehicle_type, app.config['GOOGLE_MAPS_API_KEY'],
+                    progress_callback=progress, config=config,
+                    weather_api_key=app.config['OPENWEATHER_API_KEY']
                 )
                 
-                processing_time = time.time() - start_time
-                logger.info(f"CSV processing completed in {processing_time:.2f} seconds")
+                if not analysis_result['success']:
+                    raise ValueError(f"Error processing CSV: {analysis_result['error']}")
                 
-            except Exception as e:
-                logger.error(f"CSV processing error: {str(e)}")
-                flash(f"Processing error: {str(e)}. Try using a smaller file or different bounds.", 'danger')
-                os.remove(file_path)
-                return redirect(url_for('csv_upload_bp.upload_csv'))
+                route_data = analysis_result['data']
+                analysis_cache.set(cache_key, route_data)
             
-            if not analysis_result['success']:
-                flash(f"Error processing CSV: {analysis_result['error']}", 'danger')
-                os.remove(file_path)
-                return redirect(url_for('csv_upload_bp.upload_csv'))
+            processing_time = time.time() - start_time
+            logger.info(f"CSV processing completed in {processing_time:.2f} seconds")
             
             # Prepare data for database storage (limit data size)
-            route_data = analysis_result['data']
             essential_data = prepare_essential_data(route_data)
             
             # Create and save route
             route = create_route_record(
-                bounds, route_name, vehicle_type, essential_data, processing_mode, max_points
+                bounds, route_name, vehicle_type, essential_data, processing_mode, max_points, user_id
             )
             
-            # Save to database
             try:
                 db.session.add(route)
                 db.session.commit()
                 logger.info(f"Route saved to database with ID: {route.id}")
             except Exception as e:
+                db.session.rollback()
                 logger.error(f"Database error: {str(e)}")
-                flash('Error saving route to database. Please try again.', 'danger')
-                os.remove(file_path)
-                return redirect(url_for('csv_upload_bp.upload_csv'))
-            
-            # Clean up uploaded file
-            os.remove(file_path)
-            
-            # Success message with detailed stats
-            success_message = create_success_message(essential_data, processing_time)
-            flash(success_message, 'success')
-            
-            return redirect(url_for('csv_upload_bp.view_csv_route', route_id=route.id))
+                raise ValueError('Error saving route to database. Please try again.')
             
-        except Exception as e:
-            logger.error(f"Unexpected error processing CSV route: {str(e)}")
-            flash(f'Unexpected error: {str(e)}. Please try again or contact support.', 'danger')
+            return {
+                'route_id': route.id,
+                'message': create_success_message(essential_data, processing_time)
+            }
+        finally:
+            db.session.remove()
             
-            # Clean up file if it exists
-            if file_path and os.path.exists(file_path):
+            # Clean up uploaded file
+            if os.path.exists(file_path):
                 os.remove(file_path)
-    
-    return render_template('csv_upload/upload.html', form=form, title="Upload CSV Route")
 
-def configure_analyzer(processing_mode, max_points):
-    """Configure the CSV analyzer based on user selections"""
-    
-    # Processing mode configurations
-    mode_configs = {
-        'fast': {
-            'max_points_for_analysis': 250,
-            'poi_search_points': 3,
-            'elevation_sample_points': 10,
-            'weather_sample_points': 2,
-            'sharp_turn_sample_interval': 10,
-            'enable_parallel_processing': True,
-            'api_timeout': 5
-        },
-        'standard': {
-            'max_points_for_analysis': 500,
-            'poi_search_points': 5,
-            'elevation_sample_points': 20,
-            'weather_sample_points': 3,
-            'sharp_turn_sample_interval': 5,
-            'enable_parallel_processing': True,
-            'api_timeout': 10
-        },
-        'detailed': {
-            'max_points_for_analysis': 1000,
-            'poi_search_points': 8,
-            'elevation_sample_points': 50,
-            'weather_sample_points': 5,
-            'sharp_turn_sample_interval': 3,
-            'enable_parallel_processing': True,
-            'api_timeout': 15
-        }
-    }
-    
-    # Apply mode configuration
-    config = mode_configs.get(processing_mode, mode_configs['standard'])
-    csv_analyzer.config.update(config)
-    
-    # Override max_points if specifically set
-    if max_points != 'all':
-        csv_analyzer.config['max_points_for_analysis'] = int(max_points)
-    else:
-        csv_analyzer.config['max_points_for_analysis'] = None  # No limit
+def build_analysis_config(processing_mode, max_points):
+    """Build the frozen analyzer configuration for one upload from the user's selections"""
+    return csv_analyzer.build_config(
+        processing_mode, max_points, session.get('csv_processing_overrides')
+    )
+
+def thin_evenly(items, limit):
+    """Keep at most limit items, evenly spaced and always including the last one"""
+    if len(items) <= limit:
+        return items
+    step = math.ceil(len(items) / limit)
+    thinned = items[::step]
+    if (len(items) - 1) % step:
+        thinned = thinned[:limit - 1] + [items[-1]]
+    return thinned
 
 def prepare_essential_data(route_data):
     """Prepare essential data for database storage, limiting size"""
@@ -268,7 +357,7 @@ def prepare_essential_data(route_data):
         'sharp_turns': route_data.get('sharp_turns', [])[:50],  # Limit to 50 turns
         'risk_segments': route_data.get('risk_segments', [])[:20],  # Limit to 20 segments
         'filtered_points': route_data.get('filtered_points', [])[:1000],  # Limit to 1000 points
-        'elevation': route_data.get('elevation', [])[:30],  # Limit elevation data
+        'elevation': thin_evenly(route_data.get('elevation', []), MAX_ELEVATION_POINTS_STORED),  # Keep the whole profile
         'weather': route_data.get('weather', [])[:5],  # Limit weather data
         'petrol_bunks': dict(list(route_data.get('petrol_bunks', {}).items())[:10]),  # Limit POIs
         'hospitals': dict(list(route_data.get('hospitals', {}).items())[:10]),
@@ -276,18 +365,19 @@ def prepare_essential_data(route_data):
         'food_stops': dict(list(route_data.get('food_stops', {}).items())[:10]),
         'police_stations': dict(list(route_data.get('police_stations', {}).items())[:10]),
         'processing_stats': {
-            'original_points': len(route_data.get('original_points', [])),
+            'original_points': route_data.get('total_points', len(route_data.get('original_points', []))),
+            'points_in_bounds': route_data.get('points_in_bounds', 0),
             'filtered_points': len(route_data.get('filtered_points', [])),
             'processing_time': route_data.get('processing_time', 0),
             'optimization_applied': True
         }
     }
 
-def create_route_record(bounds, route_name, vehicle_type, essential_data, processing_mode, max_points):
+def create_route_record(bounds, route_name, vehicle_type, essential_data, processing_mode, max_points, user_id):
     """Create a Route record for database storage"""
     
     route = Route(
-        user_id=current_user.id,
+        user_id=user_id,
         name=route_name,
         from_address=f"CSV Route Start: {bounds['from_lat']:.6f}, {bounds['from_lng']:.6f}",
         to_address=f"CSV Route End: {bounds['to_lat']:.6f}, {bounds['to_lng']:.6f}",
@@ -299,11 +389,11 @@ def create_route_record(bounds, route_name, vehicle_type, essential_data, proces
         distance_value=essential_data['distance_value'],
         duration=essential_data['duration'],
         duration_value=essential_data['duration_value'],
-        vehicle_type=vehicle_type,
-        polyline=json.dumps(essential_data['filtered_points'])
+        vehicle_type=vehicle_type
     )
     
-    # Save route data and risk analysis
+    # Save route points, route data and risk analysis
+    route.set_polyline(essential_data['filtered_points'])
     route.save_route_data(essential_data)
     route.save_risk_analysis(essential_data['risk_segments'])
     
@@ -379,16 +469,10 @@ def view_csv_route(route_id):
             # Calculate approximate distance for the segment
             points = segment.get('points', [])
             if len(points) >= 2:
-                from geopy.distance import geodesic
-                total_distance = 0
-                for i in range(len(points) - 1):
-                    try:
-                        p1 = (points[i][0], points[i][1])
-                        p2 = (points[i+1][0], points[i+1][1])
-                        total_distance += geodesic(p1, p2).meters
-                    except:
-                        continue
-                segment['distance'] = total_distance
+                try:
+                    segment['distance'] = path_length_m(points)
+                except (TypeError, ValueError, IndexError):
+                    segment['distance'] = 0
             else:
                 segment['distance'] = 0
     
@@ -397,7 +481,7 @@ def view_csv_route(route_id):
     
     # Prepare map data
     map_data = {
-        'polyline': json.loads(route.polyline) if route.polyline else [], 
+        'polyline': route.get_polyline(), 
         'sharp_turns': data.get('sharp_turns', []),
         'risk_segments': get_risk_map_data(risk_segments),
         'toll_gates': data.get('toll_gates', []),
@@ -448,61 +532,32 @@ def validate_csv():
         if file_size > 50 * 1024 * 1024:  # 50MB limit
             return jsonify({'valid': False, 'error': 'File too large. Maximum size is 50MB.'})
         
-        # Read and validate CSV
-        try:
-            df = pd.read_csv(file.stream, nrows=1000)  # Read first 1000 rows for validation
-            file.stream.seek(0)  # Reset stream
-            
-            # Count total rows
-            total_rows = sum(1 for line in file.stream) - 1  # Subtract header
-            file.stream.seek(0)
-            
-        except Exception as e:
-            return jsonify({'valid': False, 'error': f'Invalid CSV format: {str(e)}'})
+        # Peek at the first line so the preview can show the column layout
+        first_line = file.stream.readline().decode('utf-8', errors='replace').strip()
+        file.stream.seek(0)
         
-        # Check if CSV has at least 2 columns (lat, lng)
-        if len(df.columns) < 2:
-            return jsonify({'valid': False, 'error': 'CSV must have at least 2 columns (latitude, longitude)'})
-        
-        # Check if we have numeric data in first two columns
+        # Single streaming pass: counts, exact ranges and a preview sample
         try:
-            lat_col = pd.to_numeric(df.iloc[:, 0], errors='coerce')
-            lng_col = pd.to_numeric(df.iloc[:, 1], errors='coerce')
-            
-            # Remove NaN values
-            valid_coords = ~(lat_col.isna() | lng_col.isna())
-            lat_col = lat_col[valid_coords]
-            lng_col = lng_col[valid_coords]
-            
-            if len(lat_col) == 0:
-                return jsonify({'valid': False, 'error': 'No valid coordinate pairs found'})
-            
+            scan = csv_analyzer.scan_csv(file.stream)
         except Exception as e:
-            return jsonify({'valid': False, 'error': 'First two columns must contain numeric latitude and longitude values'})
-        
-        # Validate coordinate ranges
-        if not (lat_col.between(-90, 90).all()):
-            return jsonify({'valid': False, 'error': 'Latitude values must be between -90 and 90'})
-        
-        if not (lng_col.between(-180, 180).all()):
-            return jsonify({'valid': False, 'error': 'Longitude values must be between -180 and 180'})
+            return jsonify({'valid': False, 'error': f'Invalid CSV format: {str(e)}'})
+        finally:
+            file.stream.seek(0)
         
-        # Check for reasonable point density
-        if total_rows > 20000:
-            return jsonify({
-                'valid': False, 
-                'error': f'Too many points ({total_rows:,}). Please use a file with fewer than 20,000 points.'
-            })
+        if scan['valid_points'] == 0:
+            return jsonify({'valid': False, 'error': 'No valid coordinate pairs found. The first two columns must contain numeric latitude and longitude values'})
         
         # Return validation success with basic stats
         return jsonify({
             'valid': True,
             'stats': {
-                'total_points': total_rows,
-                'valid_coordinates': len(lat_col),
-                'lat_range': [float(lat_col.min()), float(lat_col.max())],
-                'lng_range': [float(lng_col.min()), float(lng_col.max())],
-                'columns': list(df.columns[:5]),  # Show first 5 columns
+                'total_points': scan['total_rows'],
+                'valid_coordinates': scan['valid_points'],
+                'invalid_rows': scan['total_rows'] - scan['valid_points'],
+                'lat_range': scan['lat_range'],
+                'lng_range': scan['lng_range'],
+                'sample': scan['sample'],
+                'columns': next(csv.reader([first_line]), [])[:5],  # Show first 5 columns
                 'file_size_mb': round(file_size / (1024 * 1024), 2)
             }
         })
@@ -518,13 +573,8 @@ def preview_bounds():
     try:
         data = request.get_json()
         
-        # Get bounds from request
-        bounds = {
-            'from_lat': float(data['from_lat']),
-            'from_lng': float(data['from_lng']),
-            'to_lat': float(data['to_lat']),
-            'to_lng': float(data['to_lng'])
-        }
+        # Get bounds from request (same filter modes as the upload form)
+        bounds = parse_bounds(data)
         
         # If CSV data is provided, filter and count points
         if 'csv_data' in data:
@@ -600,36 +650,72 @@ def export_csv_route(route_id):
         flash(f'Error exporting route: {str(e)}', 'danger')
         return redirect(url_for('csv_upload_bp.view_csv_route', route_id=route_id))
 
+@csv_upload_bp.route('/processing/<task_id>')
+@login_required
+def processing_page(task_id):
+    """Show progress for a queued CSV analysis"""
+    job = get_job_queue().get_status(task_id)
+    if not job or job['owner'] != str(current_user.id):
+        flash('Processing task not found.', 'danger')
+        return redirect(url_for('csv_upload_bp.upload_csv'))
+    
+    return render_template('csv_upload/processing.html', task_id=task_id, title="Processing CSV Route")
+
 @csv_upload_bp.route('/api/processing-status/<task_id>')
 @login_required
 def processing_status(task_id):
     """Check processing status for long-running CSV analysis"""
-    # This is a placeholder for future implementation with Celery or similar
-    return jsonify({
-        'status': 'processing',
-        'progress': 50,
-        'message': 'Analyzing route data...',
-        'estimated_time_remaining': 30
-    })
+    job = get_job_queue().get_status(task_id)
+    if not job or job['owner'] != str(current_user.id):
+        return jsonify({'status': 'unknown', 'error': 'Processing task not found'}), 404
+    
+    status = {
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'estimated_time_remaining': None
+    }
+    
+    # Extrapolate the remaining time from the progress made so far
+    if job['status'] == 'processing' and job['started_at'] and job['progress'] > 0:
+        elapsed = time.time() - job['started_at']
+        status['estimated_time_remaining'] = int(elapsed * (100 - job['progress']) / job['progress'])
+    
+    if job['status'] == 'complete':
+        result = job['result']
+        status['redirect_url'] = url_for('csv_upload_bp.view_csv_route', route_id=result['route_id'])
+        # Flash once, on the first poll that sees the job finished
+        if get_job_queue().mark_notified(task_id):
+            flash(result['message'], 'success')
+    elif job['status'] == 'failed':
+        status['error'] = job['error']
+    
+    return jsonify(status)
 
 @csv_upload_bp.route('/api/processing-config', methods=['GET', 'POST'])
 @login_required
 def processing_config():
     """Configure processing parameters"""
     if request.method == 'POST':
-        config = request.get_json()
+        config = request.get_json() or {}
         
-        # Update CSV analyzer configuration
-        csv_analyzer.config.update({
-            'max_points_for_analysis': config.get('max_points', 500),
-            'poi_search_points': config.get('poi_points', 5),
-            'elevation_sample_points': config.get('elevation_points', 20),
-            'enable_parallel_processing': config.get('parallel_processing', True)
-        })
+        # Save the settings that were sent for this user's future uploads
+        # ('all' points means no limit); settings not sent keep following
+        # the processing mode. The shared analyzer is never modified, so
+        # other uploads are unaffected
+        try:
+            overrides = {
+                key: parse(config[field])
+                for field, (key, parse) in PROCESSING_OVERRIDE_FIELDS.items() if field in config
+            }
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Invalid configuration values'}), 400
+        session['csv_processing_overrides'] = dict(session.get('csv_processing_overrides') or {}, **overrides)
         
         return jsonify({'success': True, 'message': 'Configuration updated'})
     
-    return jsonify(csv_analyzer.config)
+    processing_mode = request.args.get('mode', 'standard')
+    return jsonify(dict(build_analysis_config(processing_mode, request.args.get('max_points'))))
 
 # Error handlers
 @csv_upload_bp.errorhandler(413)
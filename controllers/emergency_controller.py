@@ -49,11 +49,11 @@ def emergency_analysis(route_id):
             )
             
             # Get polyline
-            polyline = json.loads(route.polyline) if route.polyline else []
+            polyline = route.get_polyline_array()
             
             # Find critical emergency points
             critical_points = find_critical_emergency_points(
-                polyline, emergency_services
+                polyline, emergency_services, places=route_data.get('places')
             )
             
             # Get risk segments for emergency plan
@@ -123,7 +123,7 @@ def emergency_map(route_id):
     
     # Get route data
     route_data = route.get_route_data()
-    polyline = json.loads(route.polyline) if route.polyline else []
+    polyline = route.get_polyline()
     
     # Get emergency data
     emergency_data = {}
@@ -144,7 +144,7 @@ def emergency_map(route_id):
             
             # Find critical emergency points
             critical_points = find_critical_emergency_points(
-                polyline, emergency_services
+                polyline, emergency_services, places=route_data.get('places')
             )
             
             emergency_data = {
@@ -36,7 +36,7 @@ def environmental_analysis(route_id):
     else:
         try:
             # Get polyline
-            polyline = json.loads(route.polyline) if route.polyline else []
+            polyline = route.get_polyline_array()
             
             # Check for sensitive zones
             sensitive_areas = environmental_analyzer.check_sensitive_zones(polyline)
@@ -117,7 +117,7 @@ def environmental_map(route_id):
     
     # Get route data
     route_data = route.get_route_data()
-    polyline = json.loads(route.polyline) if route.polyline else []
+    polyline = route.get_polyline()
     
     # Get environmental data
     environmental_data = {}
@@ -118,7 +118,7 @@ def risk_map(route_id):
     
     # Get route data
     route_data = route.get_route_data()
-    polyline = json.loads(route.polyline) if route.polyline else []
+    polyline = route.get_polyline()
     
     # Get risk analysis data
     risk_segments = route.get_risk_analysis()
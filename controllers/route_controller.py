@@ -17,6 +17,12 @@ from utils.emergency import categorize_emergency_services, find_critical_emergen
 from utils.environmental import EnvironmentalAnalyzer
 from utils.elevation import get_elevation_data
 from utils.pdf_generator import generate_enhanced_route_report
+from utils.turns import find_sharp_turns
+from utils.gmaps_cache import create_gmaps_client
+from utils.poi_fetcher import fetch_pois, plan_search_centers
+from utils.rate_limit import API_BUSY_MESSAGE, RateLimitTimeout
+from utils.route_index import RouteIndex, RouteProximityIndex
+from utils.weather import get_weather_for_points
 
 # Create blueprint
 route_bp = Blueprint('route_bp', __name__)
@@ -73,9 +79,9 @@ class RouteForm(FlaskForm):
     
 # Helper functions
 def get_gmaps_client():
-    """Get a Google Maps client instance."""
+    """Get a Google Maps client instance (responses are cached locally)."""
     api_key = current_app.config['GOOGLE_MAPS_API_KEY']
-    return googlemaps.Client(key=api_key)
+    return create_gmaps_client(api_key)
 
 def format_places_data(places_dict):
     """Format places data for storage in database."""
@@ -84,61 +90,6 @@ def format_places_data(places_dict):
         formatted[category] = {place['name']: place['vicinity'] for place in places}
     return formatted
 
-def get_weather_for_route_points(gmaps_polyline, api_key):
-    """Get weather data for points along the route."""
-    import requests
-    sampled = gmaps_polyline[::30]  # Sample every 30th point
-    weather_info = []
-    
-    for lat, lng in sampled:
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lng}&appid={api_key}&units=metric"
-        try:
-            r = requests.get(url)
-            if r.status_code == 200:
-                data = r.json()
-                weather_info.append({
-                    "icon": data['weather'][0]['icon'],
-                    "lat": lat,
-                    "lng": lng,
-                    "location": data.get("name", f"{lat},{lng}"),
-                    "temp": data['main']['temp'],
-                    "description": data['weather'][0]['description']
-                })
-        except Exception as e:
-            current_app.logger.error(f"Weather fetch error: {e}")
-    
-    return weather_info
-
-def angle_between(p1, p2, p3):
-    """Calculate angle between three points."""
-    import math
-    def bearing(p, q):
-        return math.atan2(q[1] - p[1], q[0] - p[0])
-    return abs(bearing(p1, p2) - bearing(p2, p3))
-
-def find_sharp_turns(poly):
-    """Find sharp turns in the route polyline."""
-    sharp_turns = []
-    for i in range(1, len(poly) - 1):
-        angle = angle_between(poly[i - 1], poly[i], poly[i + 1])
-        if angle > 0.5:  # ~30 degrees
-            sharp_turns.append({
-                'lat': poly[i][0], 
-                'lng': poly[i][1], 
-                'angle': round(math.degrees(angle), 2)
-            })
-    return sharp_turns
-
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula."""
-    from math import radians, cos, sin, asin, sqrt
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return 6371 * c  # km
-
 def get_major_highways(route_legs):
     """Extract major highways from route steps."""
     highways = []
@@ -220,20 +171,18 @@ def detect_bridges(route_data, gmaps):
     
     return bridges
 
-def get_alternative_routes(gmaps, origin, destination, vehicle_type):
-    """Get alternative routes for the journey."""
+def summarize_alternative_routes(directions, vehicle_type):
+    """
+    Summaries of every route in a Directions response requested with
+    alternatives=True, fastest first.
+    
+    The summaries are saved with the route, so the alternatives page never
+    calls the Directions API again.
+    """
     try:
-        # Request alternative routes from Google Directions API
-        alternatives = gmaps.directions(
-            origin=origin,
-            destination=destination,
-            mode="driving",
-            alternatives=True  # Request alternative routes
-        )
-        
         processed_routes = []
         
-        for i, route in enumerate(alternatives):
+        for i, route in enumerate(directions):
             route_info = {
                 'id': i,
                 'summary': route.get('summary', f'Route {i+1}'),
@@ -284,7 +233,7 @@ def get_alternative_routes(gmaps, origin, destination, vehicle_type):
         return processed_routes
     
     except Exception as e:
-        current_app.logger.error(f"Error getting alternative routes: {e}")
+        current_app.logger.error(f"Error summarizing alternative routes: {e}")
         return []
 
 # Routes
@@ -319,8 +268,9 @@ def index():
         try:
             gmaps = get_gmaps_client()
             
-            # Get directions
-            directions = gmaps.directions(origin, destination, mode="driving")
+            # Get directions with alternatives in one request; the first
+            # route is Google's recommended one and is analyzed below
+            directions = gmaps.directions(origin, destination, mode="driving", alternatives=True)
             
             if directions:
                 # Get basic route information
@@ -336,9 +286,6 @@ def index():
                 # Calculate sharp turns
                 sharp_turns = find_sharp_turns(poly)
                 
-                # Sample points for POI search
-                sample_points = poly[::30]  # reduced sampling
-                
                 # Define POI categories
                 categories = {
                     'petrol': 'gas_station',
@@ -348,41 +295,35 @@ def index():
                     'police': 'police'
                 }
                 
-                # Initialize places data
-                places_data = {key: [] for key in categories}
-                seen_places = {key: set() for key in categories}
-                
-                # Filter function for places
-                def filter_places(results, key):
-                    filtered = []
-                    for r in results.get('results', []):
-                        if 'geometry' not in r or 'name' not in r:
-                            continue
-                        name = r['name']
-                        loc = r['geometry']['location']
-                        place_id = r.get('place_id') or name
-                        if place_id not in seen_places[key]:
-                            if any(haversine(lat, lng, loc['lat'], loc['lng']) < 5 for lat, lng in poly):
-                                r['latlng'] = loc
-                                filtered.append(r)
-                                seen_places[key].add(place_id)
-                    return filtered
-                
-                # Fetch POIs for each category
-                for lat, lng in sample_points:
-                    for key, gtype in categories.items():
-                        try:
-                            res = gmaps.places_nearby(location=(lat, lng), radius=1000, type=gtype)
-                            places_data[key] += filter_places(res, key)
-                        except Exception as e:
-                            current_app.logger.error(f"Failed fetching {key} at ({lat}, {lng}): {e}")
+                # Fetch POIs in search circles covering the corridor along the
+                # route, every category concurrently, then keep places inside
+                # the corridor, in order along the route
+                corridor_width_m = current_app.config['POI_CORRIDOR_WIDTH_M']
+                route_index = RouteIndex(poly)
+                search_centers, search_radii = plan_search_centers(
+                    route_index, corridor_width_m, current_app.config['POI_SEARCH_MAX_RADIUS_M']
+                )
+                places_data = fetch_pois(gmaps, search_centers, categories, radii=search_radii)
+                route_proximity = RouteProximityIndex(route_index, corridor_width_m)
+                for key, places in places_data.items():
+                    if places:
+                        near, chainage, offset = route_proximity.query([(p['latlng']['lat'], p['latlng']['lng']) for p in places])
+                        kept = []
+                        for place, is_near, distance, off_route in zip(places, near, chainage, offset):
+                            if is_near:
+                                place['route_chainage_km'] = round(float(distance) / 1000, 2)
+                                place['route_offset_km'] = round(float(off_route) / 1000, 3)
+                                kept.append(place)
+                        places_data[key] = sorted(kept, key=lambda p: p['route_chainage_km'])
                 
                 # Get elevation data
                 elevation_data = get_elevation_data(gmaps, poly)
                 
-                # Get weather data
-                api_key = current_app.config['OPENWEATHER_API_KEY']
-                weather_data = get_weather_for_route_points(poly, api_key)
+                # Get weather data for every 30th point
+                weather_data = get_weather_for_points(
+                    poly[::30], current_app.config['OPENWEATHER_API_KEY'],
+                    timeout=(current_app.config['WEATHER_CONNECT_TIMEOUT'], current_app.config['WEATHER_READ_TIMEOUT'])
+                )
                 
                 # Risk analysis
                 try:
@@ -431,6 +372,25 @@ def index():
                     'police_stations': {p['name']: p['vicinity'] for p in places_data['police']}
                 }
                 
+                # One record per place kept along the route (chain outlets share
+                # names, so records are not keyed by name), with its distance
+                # along the route and how far off the route it lies
+                place_records = [
+                    {
+                        'place_id': p.get('place_id'),
+                        'name': p['name'],
+                        'vicinity': p.get('vicinity'),
+                        'category': category,
+                        'lat': p['latlng']['lat'],
+                        'lng': p['latlng']['lng'],
+                        'route_chainage_km': p['route_chainage_km'],
+                        'route_offset_km': p['route_offset_km']
+                    }
+                    for key, category in (('petrol', 'petrol_bunks'), ('hospital', 'hospitals'), ('school', 'schools'),
+                                          ('food', 'food_stops'), ('police', 'police_stations'))
+                    for p in places_data[key]
+                ]
+                
                 # Emergency services and planning
                 try:
                     emergency_services = categorize_emergency_services(
@@ -439,7 +399,7 @@ def index():
                         poi_data['petrol_bunks']
                     )
                     
-                    critical_emergency_points = find_critical_emergency_points(poly, emergency_services)
+                    critical_emergency_points = find_critical_emergency_points(poly, emergency_services, places=place_records)
                     emergency_plan = create_emergency_response_plan(poly, emergency_services, risk_segments)
                 except Exception as e:
                     current_app.logger.error(f"Error processing emergency data: {e}")
@@ -450,7 +410,7 @@ def index():
                 # Rest stop planning
                 try:
                     rest_stop_recommendations = compliance_checker.generate_rest_stop_recommendations(
-                        poly, route['duration']['value'], poi_data
+                        poly, route['duration']['value'], poi_data, places=place_records
                     )
                 except Exception as e:
                     current_app.logger.error(f"Error generating rest stops: {e}")
@@ -473,8 +433,8 @@ def index():
                 toll_gates = detect_toll_gates(directions[0], gmaps)
                 bridges = detect_bridges(directions[0], gmaps)
                 
-                # Get alternative routes
-                alternative_routes = get_alternative_routes(gmaps, origin, destination, vehicle_type)
+                # Summarize alternative routes from the same response
+                alternative_routes = summarize_alternative_routes(directions, vehicle_type)
                 
                 # Build data to pass to template
                 data = {
@@ -493,6 +453,7 @@ def index():
                     'schools': poi_data['schools'],
                     'food_stops': poi_data['food_stops'],
                     'police_stations': poi_data['police_stations'],
+                    'places': place_records,
                     'elevation': elevation_data,
                     'weather': weather_data,
                     
@@ -544,11 +505,11 @@ def index():
                     distance_value=distance_value,
                     duration=duration,
                     duration_value=duration_value,
-                    vehicle_type=vehicle_type,
-                    polyline=json.dumps(poly)
+                    vehicle_type=vehicle_type
                 )
                 
                 # Save all route data
+                route_obj.set_polyline(poly)
                 route_obj.save_route_data(data)
                 route_obj.save_risk_analysis(risk_segments)
                 
@@ -562,6 +523,9 @@ def index():
                 # Redirect to dashboard view
                 return redirect(url_for('route_bp.view', route_id=route_obj.id))
                 
+        except RateLimitTimeout as e:
+            current_app.logger.warning(f"API capacity exhausted while processing route: {e}")
+            flash(API_BUSY_MESSAGE, 'warning')
         except Exception as e:
             current_app.logger.error(f"Error processing route: {e}")
             # Include an error message to display to the user
@@ -592,7 +556,7 @@ def view(route_id):
     
     # Prepare map data
     map_data = {
-        'polyline': json.loads(route.polyline) if route.polyline else [], 
+        'polyline': route.get_polyline(), 
         'sharp_turns': data.get('sharp_turns', []),
         'risk_segments': get_risk_map_data(route.get_risk_analysis()),
         'toll_gates': data.get('toll_gates', []),
@@ -673,7 +637,7 @@ def blind_spots(route_id):
     blind_spots = route.get_blind_spots()
     
     # Get polyline for map
-    polyline_data = json.loads(route.polyline) if route.polyline else []
+    polyline_data = route.get_polyline()
     
     return render_template(
         'routes/blind_spots.html',
@@ -735,7 +699,7 @@ def generate_enhanced_report(route_id, report_type):
         'bridges': route_data.get('bridges', []),
         
         # Add route polyline for map generation
-        'route_polyline': json.loads(route.polyline) if route.polyline else []
+        'route_polyline': route.get_polyline()
     }
     
     try:
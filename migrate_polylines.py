@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Move route polylines from JSON text to the compact microdegree format.
+
+Adds the routes.polyline_e6 column if the database predates it, then
+re-saves every route that still has a JSON polyline through
+Route.set_polyline(). Safe to run more than once.
+
+Usage: python migrate_polylines.py [batch_size]
+"""
+import os
+import sys
+import json
+from flask import Flask
+from models import db, Route
+from models.route import add_polyline_column
+
+# Import app configuration
+from config import config
+
+def create_app(config_name='development'):
+    """Create a minimal app for database operations."""
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    config[config_name].init_app(app)
+    
+    # Initialize database
+    db.init_app(app)
+    
+    return app
+
+def migrate_polylines(app, batch_size=200):
+    """Convert JSON polylines in batches; returns (migrated, failed) counts."""
+    migrated = 0
+    failed = 0
+    
+    with app.app_context():
+        db.create_all()
+        if add_polyline_column():
+            print("Added column routes.polyline_e6")
+        
+        last_id = 0
+        while True:
+            routes = (Route.query
+                      .filter(Route.id > last_id, Route.polyline.isnot(None))
+                      .order_by(Route.id)
+                      .limit(batch_size)
+                      .all())
+            if not routes:
+                break
+            
+            for route in routes:
+                last_id = route.id
+                try:
+                    route.set_polyline(json.loads(route.polyline))
+                    migrated += 1
+                except (ValueError, TypeError) as e:
+                    # Leave unreadable rows untouched so they can be inspected
+                    print(f"Route {route.id}: could not convert polyline ({e})")
+                    failed += 1
+            
+            db.session.commit()
+            print(f"Migrated {migrated} routes so far...")
+    
+    return migrated, failed
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    
+    # Create application
+    env = os.getenv('FLASK_ENV', 'development')
+    app = create_app(env)
+    
+    migrated, failed = migrate_polylines(app, batch_size)
+    
+    print(f"\nMigrated {migrated} route polylines.")
+    if failed:
+        print(f"{failed} routes could not be converted and still use JSON.")
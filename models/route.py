@@ -1,5 +1,8 @@
 import json
+import zlib
+import numpy as np
 from datetime import datetime
+from sqlalchemy import inspect, text
 from . import db
 
 class Route(db.Model):
@@ -23,8 +26,12 @@ class Route(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Route points in the compact format written by set_polyline. Deferred
+    # so that pages listing routes never load it.
+    polyline_e6 = db.deferred(db.Column(db.LargeBinary))
+    
     # Serialized route data (JSON)
-    polyline = db.Column(db.Text)  # Encoded polyline of the route
+    polyline = db.Column(db.Text)  # Legacy JSON polyline of rows not yet migrated
     route_data = db.Column(db.Text)  # Serialized route data in JSON
     risk_analysis = db.Column(db.Text)  # Risk analysis results in JSON
     
@@ -42,6 +49,43 @@ class Route(db.Model):
     def __init__(self, **kwargs):
         super(Route, self).__init__(**kwargs)
     
+    def set_polyline(self, points):
+        """
+        Save route points in the compact format.
+        
+        Points are rounded to microdegrees (about 0.1 m) and stored as
+        zlib-compressed little-endian int32 deltas from the previous point,
+        which is around a tenth of the size of the JSON text.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        microdegrees = np.round(points * 1e6).astype(np.int64)
+        deltas = np.diff(microdegrees, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        self.polyline_e6 = zlib.compress(deltas.astype('<i4').tobytes())
+        self.polyline = None
+        self._polyline_cache = None
+    
+    def get_polyline_array(self):
+        """Get route points as a float64 (N, 2) array, decoded once per instance."""
+        cached = getattr(self, '_polyline_cache', None)
+        if cached is not None:
+            return cached
+        
+        if self.polyline_e6:
+            deltas = np.frombuffer(zlib.decompress(self.polyline_e6), dtype='<i4').reshape(-1, 2)
+            points = np.cumsum(deltas, axis=0, dtype=np.int64) / 1e6
+        elif self.polyline:
+            # Rows saved before the compact format
+            points = np.asarray(json.loads(self.polyline), dtype=np.float64).reshape(-1, 2)
+        else:
+            points = np.empty((0, 2))
+        
+        self._polyline_cache = points
+        return points
+    
+    def get_polyline(self):
+        """Get route points as a list of [lat, lng] pairs."""
+        return self.get_polyline_array().tolist()
+    
     def save_route_data(self, data):
         """Save route data as JSON."""
         self.route_data = json.dumps(data)
@@ -96,4 +140,23 @@ class Route(db.Model):
         return [turn for turn in turns if turn.get('angle', 0) > 70]  # Turns with angles > 70° are blind spots
     
     def __repr__(self):
-        return f'<Route {self.id}: {self.from_address} to {self.to_address}>'
\ No newline at end of file
+        return f'<Route {self.id}: {self.from_address} to {self.to_address}>'
+
+def add_polyline_column():
+    """Add routes.polyline_e6 to databases created before it existed.
+    
+    db.create_all() never adds columns to existing tables, so this runs at
+    startup; rows keep their JSON polyline until migrate_polylines.py
+    converts them.
+    
+    Returns:
+        True if the column was added, False if it already existed
+    """
+    columns = [column['name'] for column in inspect(db.engine).get_columns('routes')]
+    if 'polyline_e6' in columns:
+        return False
+    
+    blob_type = 'BYTEA' if db.engine.dialect.name == 'postgresql' else 'BLOB'
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE routes ADD COLUMN polyline_e6 {blob_type}'))
+    return True
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+class SQLiteCache:
+    """
+    Key/value cache stored in a SQLite file
+    
+    A single file can be shared by every gunicorn worker on the host, so a
+    value computed by one worker is served to all of them. Values are stored
+    as JSON. Entries expire after their TTL, and when ``max_entries`` is set
+    the least recently used entries are evicted on write.
+    """
+    
+    def __init__(self, path, namespace='default', max_entries=None, default_ttl=None):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, accessed_at)"
+            )
+    
+    def _connection(self):
+        """Get this thread's connection (sqlite3 connections are not thread safe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        entry = self.get_entry(key)
+        return entry['value'] if entry else default
+    
+    def get_entry(self, key):
+        """
+        Return the cached entry for key with its metadata
+        
+        Returns:
+            dict: {'value', 'created_at', 'expires_at'} or None if missing or expired
+        """
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            
+            if row is None:
+                return None
+            
+            now = time.time()
+            if row[2] is not None and row[2] <= now:
+                with conn:
+                    conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key)
+                    )
+                return None
+            
+            if self.max_entries:
+                with conn:
+                    conn.execute(
+                        "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                        (now, self.namespace, key)
+                    )
+            
+            return {'value': json.loads(row[0]), 'created_at': row[1], 'expires_at': row[2]}
+        except Exception as e:
+            logger.warning(f"Cache read error for {self.namespace}: {e}")
+            return None
+    
+    def set(self, key, value, ttl=None):
+        """Store value under key; ttl in seconds (None uses the cache default, 0 never expires)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO cache_entries
+                       (namespace, key, value, created_at, expires_at, accessed_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (self.namespace, key, json.dumps(value), now, expires_at, now)
+                )
+                
+                if self.max_entries:
+                    conn.execute(
+                        """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                               SELECT key FROM cache_entries WHERE namespace = ?
+                               ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                           )""",
+                        (self.namespace, self.namespace, self.max_entries)
+                    )
+        except Exception as e:
+            logger.warning(f"Cache write error for {self.namespace}: {e}")
+    
+    def get_many(self, keys):
+        """
+        Look up several keys in one pass
+        
+        Returns:
+            dict: key -> value for the keys that are present and not expired
+        """
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        
+        try:
+            conn = self._connection()
+            now = time.time()
+            
+            # Stay well below SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"""SELECT key, value FROM cache_entries
+                        WHERE namespace = ? AND key IN ({placeholders})
+                        AND (expires_at IS NULL OR expires_at > ?)""",
+                    (self.namespace, *chunk, now)
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            
+            if self.max_entries and found:
+                with conn:
+                    conn.executemany(
+                        "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                        [(now, self.namespace, key) for key in found]
+                    )
+        except Exception as e:
+            logger.warning(f"Cache read error for {self.namespace}: {e}")
+        
+        return found
+    
+    def set_many(self, items, ttl=None):
+        """Store every key/value pair of items in one transaction; ttl as in set()"""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    """INSERT OR REPLACE INTO cache_entries
+                       (namespace, key, value, created_at, expires_at, accessed_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [(self.namespace, key, json.dumps(value), now, expires_at, now)
+                     for key, value in items.items()]
+                )
+                
+                if self.max_entries:
+                    conn.execute(
+                        """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                               SELECT key FROM cache_entries WHERE namespace = ?
+                               ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                           )""",
+                        (self.namespace, self.namespace, self.max_entries)
+                    )
+        except Exception as e:
+            logger.warning(f"Cache write error for {self.namespace}: {e}")
+    
+    def delete(self, key):
+        """Remove key from the cache"""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                )
+        except Exception as e:
+            logger.warning(f"Cache delete error for {self.namespace}: {e}")
+    
+    def purge_expired(self):
+        """Delete every expired entry in this namespace"""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                    (self.namespace, time.time())
+                )
+        except Exception as e:
+            logger.warning(f"Cache purge error for {self.namespace}: {e}")
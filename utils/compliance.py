@@ -2,11 +2,27 @@ import json
 import os
 import datetime
 import logging
-from geopy.distance import geodesic
+from .geo import zone_distances_km
+from .route_index import RouteIndex
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Stops farther than this from the route are not matched to breaks
+REST_STOP_MAX_OFFSET_M = 5000
+
+# Place categories that serve as rest stops, and the stop type of each
+REST_STOP_CATEGORIES = {
+    "petrol_bunks": "fuel",
+    "food_stops": "food"
+}
+
+# Amenities offered at each type of rest stop
+REST_STOP_AMENITIES = {
+    "fuel": ["fuel", "restroom"],
+    "food": ["food", "restroom"]
+}
+
 class ComplianceChecker:
     """Handle regulatory compliance checks for routes"""
     
@@ -393,17 +409,23 @@ class ComplianceChecker:
         
         # Check each point in the route against all restricted zones
         sample_interval = max(1, len(route_points) // 20)  # Check approximately every 5% of route
+        sample_indices = list(range(0, len(route_points), sample_interval))
+        sample_points = [(route_points[i][0], route_points[i][1]) for i in sample_indices]
         
-        for i in range(0, len(route_points), sample_interval):
-            if i >= len(route_points):
-                break
-                
-            point_coord = (route_points[i][0], route_points[i][1])
+        time_zones = self.restricted_zones.get("time_restricted_zones", [])
+        no_entry_zones = self.restricted_zones.get("no_entry_zones", [])
+        hazmat_zones = self.restricted_zones.get("hazardous_materials_restricted", [])
+        
+        # Distances (km) from every sampled point to every zone center at once
+        time_km = zone_distances_km(sample_points, time_zones)
+        no_entry_km = zone_distances_km(sample_points, no_entry_zones)
+        hazmat_km = zone_distances_km(sample_points, hazmat_zones)
+        
+        for row, i in enumerate(sample_indices):
+            point_coord = sample_points[row]
             
             # Check time restricted zones
-            for zone in self.restricted_zones.get("time_restricted_zones", []):
-                zone_center = (zone["coordinates"]["lat"], zone["coordinates"]["lng"])
-                distance = geodesic(point_coord, zone_center).kilometers
+            for zone, distance in zip(time_zones, time_km[row]):
                 
                 if distance <= zone["radius_km"]:
                     # Route passes through this restricted zone
@@ -422,9 +444,7 @@ class ComplianceChecker:
                         })
             
             # Check no entry zones
-            for zone in self.restricted_zones.get("no_entry_zones", []):
-                zone_center = (zone["coordinates"]["lat"], zone["coordinates"]["lng"])
-                distance = geodesic(point_coord, zone_center).kilometers
+            for zone, distance in zip(no_entry_zones, no_entry_km[row]):
                 
                 if distance <= zone["radius_km"]:
                     # Route passes through this no entry zone
@@ -442,9 +462,7 @@ class ComplianceChecker:
                         })
             
             # Check hazardous materials restricted zones
-            for zone in self.restricted_zones.get("hazardous_materials_restricted", []):
-                zone_center = (zone["coordinates"]["lat"], zone["coordinates"]["lng"])
-                distance = geodesic(point_coord, zone_center).kilometers
+            for zone, distance in zip(hazmat_zones, hazmat_km[row]):
                 
                 if distance <= zone["radius_km"]:
                     # Route passes through this hazmat restricted zone
@@ -544,8 +562,20 @@ class ComplianceChecker:
         
         return rtsp_compliance
     
-    def generate_rest_stop_recommendations(self, route_data, duration_seconds, poi_data, vehicle_type="car"):
-        """Generate recommendations for rest stops based on RTSP rules"""
+    def generate_rest_stop_recommendations(self, route_data, duration_seconds, poi_data, vehicle_type="car",
+                                           places=None):
+        """
+        Generate recommendations for rest stops based on RTSP rules
+        
+        route_data is the route polyline. places, when given, are the place
+        records saved with the route (name, vicinity, category,
+        route_chainage_km and route_offset_km); its fuel stations and food
+        stops are the candidate stops, and each break is matched to the stop
+        whose chainage is closest to where the break is due (preferring one
+        reached before the driving limit). A break with no stop left gets its
+        time and position but no named stop. Without places, the names in
+        poi_data are used in list order.
+        """
         # Get vehicle-specific rules
         if vehicle_type not in self.rtsp_rules["driving_hour_limits"]:
             vehicle_type = "car"  # Default to car rules
@@ -564,52 +594,96 @@ class ComplianceChecker:
         # Calculate how many breaks are needed
         breaks_needed = int(duration_seconds / continuous_driving_seconds)
         
-        # Identify potential rest stop locations
+        # Identify potential rest stop locations, with their chainage when known
         potential_stops = []
+        stop_distances = {}
         
-        # Add fuel stations as potential stops
-        if "petrol_bunks" in poi_data:
-            for name, location in poi_data["petrol_bunks"].items():
+        if places is not None:
+            for place in places:
+                stop_type = REST_STOP_CATEGORIES.get(place.get("category"))
+                if stop_type is None:
+                    continue
+                if place.get("route_offset_km", 0) * 1000 <= REST_STOP_MAX_OFFSET_M:
+                    stop_distances[len(potential_stops)] = place["route_chainage_km"] * 1000
                 potential_stops.append({
-                    "name": name,
-                    "location": location,
-                    "type": "fuel",
-                    "amenities": ["fuel", "restroom"]
+                    "name": place["name"],
+                    "location": place.get("vicinity"),
+                    "type": stop_type,
+                    "amenities": REST_STOP_AMENITIES[stop_type]
                 })
+        else:
+            # Add fuel stations, then food stops, as potential stops
+            for category, stop_type in REST_STOP_CATEGORIES.items():
+                for name, location in poi_data.get(category, {}).items():
+                    potential_stops.append({
+                        "name": name,
+                        "location": location,
+                        "type": stop_type,
+                        "amenities": REST_STOP_AMENITIES[stop_type]
+                    })
         
-        # Add food stops as potential stops
-        if "food_stops" in poi_data:
-            for name, location in poi_data["food_stops"].items():
-                potential_stops.append({
-                    "name": name,
-                    "location": location,
-                    "type": "food",
-                    "amenities": ["food", "restroom"]
-                })
+        segment_duration = duration_seconds / (breaks_needed + 1)
+        route_index = RouteIndex([] if route_data is None else route_data, duration_seconds)
         
-        # If we have potential stops, space them evenly along the route
-        if potential_stops and breaks_needed > 0:
-            # This is a simplified approach - in a real implementation,
-            # you would calculate the actual position along the route
-            segment_duration = duration_seconds / (breaks_needed + 1)
+        # With place records, breaks are placed by position along the route;
+        # otherwise stops are spaced out in list order
+        by_position = places is not None and route_index.eta is not None
+        if not by_position and not potential_stops:
+            return recommendations
+        
+        last_distance = -1.0
+        for i in range(1, breaks_needed + 1):
+            target_time = i * segment_duration
+            stop_index = None
+            distance_m = None
             
-            for i in range(1, breaks_needed + 1):
-                target_time = i * segment_duration
-                # Find closest potential stop to this time point
-                # (simplified - in reality, would match to route position)
-                
-                if i <= len(potential_stops):
-                    stop = potential_stops[i-1]
-                    driving_hours = (target_time / 3600)
-                    
-                    recommendations.append({
-                        "stop_number": i,
-                        "estimated_driving_time": f"{driving_hours:.1f} hours",
-                        "recommended_break_minutes": self.rtsp_rules["rest_period_requirements"][vehicle_type]["short_break_minutes"],
-                        "name": stop["name"],
-                        "location": stop["location"],
-                        "type": stop["type"],
-                        "amenities": stop["amenities"]
-                    })
+            if by_position:
+                # Match the break to a stop by position along the route,
+                # beyond the previous break
+                target_distance = float(route_index.distance_at_time(target_time))
+                candidates = [j for j in stop_distances if stop_distances[j] > last_distance]
+                if candidates:
+                    before = [j for j in candidates if stop_distances[j] <= target_distance]
+                    if before:
+                        stop_index = max(before, key=lambda j: stop_distances[j])
+                    else:
+                        stop_index = min(candidates, key=lambda j: stop_distances[j] - target_distance)
+                    distance_m = stop_distances[stop_index]
+                    last_distance = distance_m
+                    target_time = float(route_index.time_at(distance_m))
+                else:
+                    # No stop left: the break is still due, at no named stop
+                    distance_m = target_distance
+            elif i <= len(potential_stops):
+                stop_index = i - 1
+            else:
+                continue
+            
+            driving_hours = (target_time / 3600)
+            
+            recommendation = {
+                "stop_number": i,
+                "estimated_driving_time": f"{driving_hours:.1f} hours",
+                "recommended_break_minutes": self.rtsp_rules["rest_period_requirements"][vehicle_type]["short_break_minutes"],
+                "name": None,
+                "location": None,
+                "type": None,
+                "amenities": []
+            }
+            if stop_index is not None:
+                stop = potential_stops[stop_index]
+                recommendation.update({
+                    "name": stop["name"],
+                    "location": stop["location"],
+                    "type": stop["type"],
+                    "amenities": stop["amenities"]
+                })
+            else:
+                lat, lng = route_index.point_at(distance_m)
+                recommendation["position"] = [round(float(lat), 6), round(float(lng), 6)]
+            if distance_m is not None:
+                recommendation["distance_from_start_km"] = round(distance_m / 1000, 1)
+            
+            recommendations.append(recommendation)
         
-        return recommendations
\ No newline at end of file
+        return recommendations
@@ -2,13 +2,14 @@
 import pandas as pd
 import numpy as np
 import json
+import hashlib
 import googlemaps
 import logging
-from geopy.distance import geodesic
 from datetime import datetime
 import math
 import concurrent.futures
 import time
+import types
 
 # Import existing utility functions
 from .risk_analysis import calculate_route_risk, get_risk_map_data, get_vehicle_adjusted_time
@@ -16,161 +17,361 @@ from .compliance import ComplianceChecker
 from .emergency import categorize_emergency_services, find_critical_emergency_points, create_emergency_response_plan
 from .environmental import EnvironmentalAnalyzer
 from .elevation import get_elevation_data
+from .geo import as_points, path_length_m
+from .route_ordering import order_points
+from .simplify import simplify_to_count, simplify_tolerance
+from .turns import find_sharp_turns
+from .route_index import RouteIndex
+from .gmaps_cache import create_gmaps_client
+from .poi_fetcher import fetch_pois
+from .rate_limit import API_BUSY_MESSAGE, RateLimitTimeout
+from .weather import DEFAULT_TIMEOUT as DEFAULT_WEATHER_TIMEOUT, get_weather_for_points
+from .spatial_filter import bounds_mask, canonical_bounds
+from config.processing_config import PROGRESS_MESSAGES, get_processing_config
 
 logger = logging.getLogger(__name__)
 
 class CSVRouteAnalyzer:
-    """Analyze routes from CSV data containing latitude/longitude coordinates - COMPLETE VERSION"""
+    """
+    Analyze routes from CSV data containing latitude/longitude coordinates - COMPLETE VERSION
+    
+    One analyzer is shared by every request. It holds no per-run state: each
+    analysis gets its own read-only config from build_config(), which is
+    passed down to every step, so concurrent runs in different processing
+    modes cannot see each other's settings.
+    """
+    
+    # Settings that are not tied to a processing mode
+    BASE_CONFIG = {
+        'api_timeout': 10,
+        # How filtered points are put in route order ('auto', 'nearest' or
+        # 'sequential', see utils/route_ordering.py)
+        'route_ordering': 'auto',
+        # Streaming ingestion: rows parsed per chunk and the cap on
+        # in-bounds points held in memory while reading
+        'csv_chunk_rows': 50000,
+        'max_points_in_memory': 20000
+    }
     
     def __init__(self):
         self.compliance_checker = ComplianceChecker()
         self.environmental_analyzer = EnvironmentalAnalyzer()
-        # Configuration for performance optimization
-        self.config = {
-            'max_points_for_analysis': 500,
-            'poi_search_points': 5,
-            'elevation_sample_points': 20,
-            'weather_sample_points': 3,
-            'sharp_turn_sample_interval': 5,
-            'enable_parallel_processing': True,
-            'api_timeout': 10
-        }
+        # Default configuration, used when a caller does not pass its own
+        self.config = self.build_config()
     
-    def optimize_point_density(self, points, target_points=500):
-        """Reduce point density using Douglas-Peucker algorithm"""
-        if len(points) <= target_points:
-            return points
+    def build_config(self, processing_mode='standard', max_points=None, overrides=None):
+        """
+        Build a frozen configuration for one analysis run
+        
+        Args:
+            processing_mode (str): Processing mode ('fast', 'standard', 'detailed')
+            max_points: Override for max_points_for_analysis ('all' for no limit)
+            overrides (dict): Saved settings that take precedence over the mode
+                (an explicit max_points still wins)
         
-        logger.info(f"Optimizing {len(points)} points to approximately {target_points}")
+        Returns:
+            MappingProxyType: Read-only configuration mapping
+        """
+        config = dict(self.BASE_CONFIG)
+        config.update(get_processing_config(processing_mode))
+        if overrides:
+            config.update(overrides)
+        if max_points:
+            config['max_points_for_analysis'] = get_processing_config(
+                processing_mode, max_points
+            )['max_points_for_analysis']
+        return types.MappingProxyType(config)
+    
+    def load_coordinates(self, csv_file_path):
+        """
+        Load the first two CSV columns as a float64 (N, 2) array of [lat, lng]
         
-        # Simple uniform sampling as fallback
-        if len(points) > target_points * 2:
-            step = len(points) // target_points
-            optimized = points[::step]
-            # Always include start and end points
-            if optimized[0] != points[0]:
-                optimized.insert(0, points[0])
-            if optimized[-1] != points[-1]:
-                optimized.append(points[-1])
-            return optimized
+        Non-numeric cells (including a header row, if present), NaN values and
+        out-of-range coordinates are dropped with one vectorized mask per chunk.
         
-        return self.douglas_peucker_simplify(points, tolerance=0.0001)
+        Raises:
+            ValueError: If the CSV has fewer than two columns
+        """
+        chunks = [coords for _, coords in self.iter_coordinate_chunks(csv_file_path)]
+        if not chunks:
+            return np.empty((0, 2))
+        return np.concatenate(chunks)
     
-    def douglas_peucker_simplify(self, points, tolerance=0.0001):
-        """Simplify route using Douglas-Peucker algorithm"""
-        if len(points) <= 2:
-            return points
+    def coerce_coordinates(self, lat_values, lng_values):
+        """Coerce two columns to float64 and keep only finite, in-range pairs"""
+        lats = pd.to_numeric(lat_values, errors='coerce').to_numpy(dtype=np.float64)
+        lngs = pd.to_numeric(lng_values, errors='coerce').to_numpy(dtype=np.float64)
         
-        # Find the point with maximum distance from line between first and last
-        max_distance = 0
-        max_index = 0
-        
-        for i in range(1, len(points) - 1):
-            distance = self.point_to_line_distance(points[i], points[0], points[-1])
-            if distance > max_distance:
-                max_distance = distance
-                max_index = i
-        
-        # If max distance is greater than tolerance, recursively simplify
-        if max_distance > tolerance:
-            left_points = self.douglas_peucker_simplify(points[:max_index + 1], tolerance)
-            right_points = self.douglas_peucker_simplify(points[max_index:], tolerance)
-            return left_points[:-1] + right_points
-        else:
-            return [points[0], points[-1]]
+        # NaN compares False, so this also masks unparseable cells
+        valid = (lats >= -90) & (lats <= 90) & (lngs >= -180) & (lngs <= 180)
+        
+        return np.column_stack((lats[valid], lngs[valid]))
     
-    def point_to_line_distance(self, point, line_start, line_end):
-        """Calculate perpendicular distance from point to line"""
+    def iter_coordinate_chunks(self, csv_file_path, chunk_rows=None):
+        """
+        Stream the CSV (a path or file object) in fixed-size chunks
+        
+        Yields:
+            tuple: (rows read in this chunk, float64 (N, 2) array of valid [lat, lng])
+        """
+        chunk_rows = chunk_rows or self.config['csv_chunk_rows']
         try:
-            # Convert to approximate Cartesian coordinates for calculation
-            x0, y0 = point[1], point[0]  # lng, lat
-            x1, y1 = line_start[1], line_start[0]
-            x2, y2 = line_end[1], line_end[0]
+            reader = pd.read_csv(csv_file_path, header=None, usecols=[0, 1], dtype=str,
+                                 skipinitialspace=True, chunksize=chunk_rows)
+        except ValueError:
+            raise ValueError('CSV must have at least 2 columns (latitude, longitude)')
+        
+        with reader:
+            for chunk in reader:
+                yield len(chunk), self.coerce_coordinates(chunk.iloc[:, 0], chunk.iloc[:, 1])
+    
+    def scan_csv(self, csv_file, sample_size=500):
+        """
+        Collect validation statistics for a CSV in one sequential pass
+        
+        Produces the row count, valid-pair count, exact lat/lng ranges over
+        every valid pair, and a uniform random sample of valid pairs for
+        previews. The sample is a bottom-k reservoir: every valid pair gets a
+        random key and the ``sample_size`` smallest keys seen so far are kept.
+        
+        Args:
+            csv_file: Path or binary/text file object positioned at the start
+            sample_size (int): Maximum number of pairs in the preview sample
+        
+        Returns:
+            dict: total_rows, valid_points, lat_range, lng_range, sample
+        """
+        rng = np.random.default_rng()
+        stats = {'total_rows': 0, 'valid_points': 0}
+        lat_min = lng_min = np.inf
+        lat_max = lng_max = -np.inf
+        sample_keys = np.empty(0)
+        sample_points = np.empty((0, 2))
+        sample_rows = np.empty(0, dtype=np.int64)
+        
+        for rows, coords in self.iter_coordinate_chunks(csv_file):
+            first_row = stats['total_rows']
+            stats['total_rows'] += rows
+            if len(coords) == 0:
+                continue
+            stats['valid_points'] += len(coords)
+            
+            lat_min = min(lat_min, coords[:, 0].min())
+            lat_max = max(lat_max, coords[:, 0].max())
+            lng_min = min(lng_min, coords[:, 1].min())
+            lng_max = max(lng_max, coords[:, 1].max())
+            
+            # File position of each pair, used only to order the preview sample
+            keys = np.concatenate((sample_keys, rng.random(len(coords))))
+            points = np.vstack((sample_points, coords))
+            rows_seen = np.concatenate((sample_rows, first_row + np.arange(len(coords))))
+            keep = np.argsort(keys)[:sample_size]
+            sample_keys, sample_points, sample_rows = keys[keep], points[keep], rows_seen[keep]
+        
+        if stats['valid_points']:
+            stats['lat_range'] = [float(lat_min), float(lat_max)]
+            stats['lng_range'] = [float(lng_min), float(lng_max)]
+        else:
+            stats['lat_range'] = stats['lng_range'] = None
+        
+        # Present the sample in file order so it can be drawn as a trace
+        stats['sample'] = sample_points[np.argsort(sample_rows)].tolist()
+        
+        return stats
+    
+    def stream_points_in_bounds(self, csv_file_path, bounds, max_points_in_memory=None, chunk_rows=None):
+        """
+        Read a CSV of any size and keep a bounded, evenly decimated set of in-bounds points
+        
+        Each chunk is filtered by bounds as it is read. Kept points are every
+        ``stride``-th in-bounds point; whenever the working set grows past
+        ``max_points_in_memory`` every other kept point is dropped and the
+        stride doubles, so memory stays flat regardless of file size. The last
+        in-bounds point is always kept so the route keeps its true end.
+        
+        Returns:
+            tuple: (float64 (N, 2) array of points, dict of ingestion stats)
+        """
+        limit = max_points_in_memory or self.config['max_points_in_memory']
+        
+        stats = {'total_rows': 0, 'valid_points': 0, 'points_in_bounds': 0, 'decimation_stride': 1}
+        head = []
+        head_count = 0
+        kept = []
+        kept_count = 0
+        last_point = None
+        stride = 1
+        
+        for rows, coords in self.iter_coordinate_chunks(csv_file_path, chunk_rows):
+            stats['total_rows'] += rows
+            stats['valid_points'] += len(coords)
+            
+            # Keep a small sample of the raw trace for display
+            if head_count < 100 and len(coords):
+                head.append(coords[:100 - head_count])
+                head_count += len(head[-1])
+            
+            inside = self.filter_points_by_bounds(coords, bounds)
+            if len(inside) == 0:
+                continue
             
-            # Calculate distance using point-to-line formula
-            num = abs((y2 - y1) * x0 - (x2 - x1) * y0 + x2 * y1 - y2 * x1)
-            den = math.sqrt((y2 - y1)**2 + (x2 - x1)**2)
+            # Global in-bounds index of each point decides whether it is kept
+            positions = np.arange(stats['points_in_bounds'], stats['points_in_bounds'] + len(inside))
+            stats['points_in_bounds'] += len(inside)
+            last_point = inside[-1]
             
-            return num / den if den != 0 else 0
-        except:
-            return 0
+            selected = inside[positions % stride == 0]
+            kept.append(selected)
+            kept_count += len(selected)
+            
+            while kept_count > limit:
+                # Kept points sit at multiples of stride, so [::2] leaves multiples of 2 * stride
+                merged = np.concatenate(kept)[::2]
+                kept = [merged]
+                kept_count = len(merged)
+                stride *= 2
+        
+        stats['decimation_stride'] = stride
+        stats['original_points'] = np.concatenate(head) if head else np.empty((0, 2))
+        
+        if not kept_count:
+            return np.empty((0, 2)), stats
+        
+        points = np.concatenate(kept)
+        if (stats['points_in_bounds'] - 1) % stride != 0:
+            points = np.vstack((points, last_point))
+        
+        if stride > 1:
+            logger.info(f"Decimated {stats['points_in_bounds']} in-bounds points by {stride} to {len(points)}")
+        
+        return points, stats
     
-    def process_csv_route(self, csv_file_path, bounds, vehicle_type, api_key):
+    def optimize_point_density(self, points, target_points=500):
+        """
+        Reduce an ordered path to target_points with Douglas-Peucker
+        
+        Points are added in order of how far they deviate from the simplified
+        line, so turns and curves are kept ahead of straight stretches and the
+        budget is met exactly.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if len(points) <= target_points:
+            return points
+        
+        logger.info(f"Optimizing {len(points)} points to {target_points}")
+        return points[simplify_to_count(points, target_points)]
+    
+    def douglas_peucker_simplify(self, points, tolerance_m=10.0):
+        """Simplify an ordered path with Douglas-Peucker, tolerance in meters"""
+        points = np.asarray(points, dtype=np.float64)
+        return points[simplify_tolerance(points, tolerance_m)]
+    
+    def analysis_cache_key(self, csv_file_path, bounds, vehicle_type, config):
+        """
+        Build a content-addressed cache key for an analysis run
+        
+        The key is a SHA-256 over the file bytes plus every input that changes
+        the result, so byte-identical uploads with the same settings share it
+        regardless of file name or upload time.
+        """
+        digest = hashlib.sha256()
+        with open(csv_file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        
+        settings = {
+            'bounds': canonical_bounds(bounds),
+            'vehicle_type': vehicle_type,
+            'config': dict(config)
+        }
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        
+        return digest.hexdigest()
+    
+    def report_progress(self, progress_callback, percent):
+        """Report a processing stage from PROGRESS_MESSAGES to the caller, if it asked"""
+        if progress_callback:
+            progress_callback(percent, PROGRESS_MESSAGES.get(percent))
+    
+    def process_csv_route(self, csv_file_path, bounds, vehicle_type, api_key, progress_callback=None,
+                          config=None, weather_api_key=None):
         """
         Process CSV file and analyze route within specified bounds - COMPLETE
+        
+        config is the run's settings from build_config() (the analyzer
+        defaults when omitted). progress_callback, if given, is called as ``callback(percent, message)``
+        at each stage listed in PROGRESS_MESSAGES. api_key is the Google Maps
+        key and weather_api_key the OpenWeather key.
         """
         start_time = time.time()
+        config = config or self.config
         try:
             logger.info("Starting CSV route processing...")
+            self.report_progress(progress_callback, 0)
             
-            # Read CSV file
-            df = pd.read_csv(csv_file_path)
-            
-            # Validate CSV structure
-            if len(df.columns) < 2:
-                return {'success': False, 'error': 'CSV must have at least 2 columns (latitude, longitude)'}
-            
-            # Extract coordinates (assume first two columns are lat, lng)
-            original_points = []
-            for index, row in df.iterrows():
-                try:
-                    lat = float(row.iloc[0])
-                    lng = float(row.iloc[1])
-                    
-                    # Validate coordinate ranges
-                    if -90 <= lat <= 90 and -180 <= lng <= 180:
-                        original_points.append([lat, lng])
-                except (ValueError, TypeError):
-                    continue
+            self.report_progress(progress_callback, 10)
+            # Stream the CSV in chunks, filtering by bounds as we go
+            try:
+                filtered_points, ingest_stats = self.stream_points_in_bounds(
+                    csv_file_path, bounds, config['max_points_in_memory'], config['csv_chunk_rows']
+                )
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
             
-            if not original_points:
+            if ingest_stats['valid_points'] == 0:
                 return {'success': False, 'error': 'No valid coordinate pairs found in CSV'}
             
-            logger.info(f"Loaded {len(original_points)} valid coordinates")
-            
-            # Filter points within bounds
-            filtered_points = self.filter_points_by_bounds(original_points, bounds)
+            logger.info(f"Read {ingest_stats['total_rows']} rows, {ingest_stats['valid_points']} valid coordinates")
             
-            if not filtered_points:
+            if len(filtered_points) == 0:
                 return {'success': False, 'error': 'No points found within specified bounds'}
             
-            logger.info(f"Filtered to {len(filtered_points)} points within bounds")
+            logger.info(f"Filtered to {ingest_stats['points_in_bounds']} points within bounds")
+            self.report_progress(progress_callback, 20)
             
-            # OPTIMIZE: Reduce point density for analysis
-            if len(filtered_points) > self.config['max_points_for_analysis']:
-                optimized_points = self.optimize_point_density(
-                    filtered_points, 
-                    self.config['max_points_for_analysis']
-                )
-                logger.info(f"Optimized to {len(optimized_points)} points for analysis")
-            else:
-                optimized_points = filtered_points
+            # Sort points to create logical route order; simplification
+            # needs the points in path order to tell curves from straights
+            self.report_progress(progress_callback, 30)
+            ordered_points = self.order_route_points(filtered_points, bounds, config['route_ordering'])
             
-            # Sort points to create logical route order
-            ordered_points = self.order_route_points(optimized_points, bounds)
+            # OPTIMIZE: Reduce point density for analysis
+            max_points = config['max_points_for_analysis']
+            if max_points and len(ordered_points) > max_points:
+                ordered_points = self.optimize_point_density(
+                    ordered_points, 
+                    max_points
+                ).tolist()
+                logger.info(f"Optimized to {len(ordered_points)} points for analysis")
             
             # Initialize Google Maps client
             try:
-                gmaps = googlemaps.Client(key=api_key)
+                gmaps = create_gmaps_client(api_key)
             except Exception as e:
                 logger.error(f"Failed to initialize Google Maps client: {e}")
                 gmaps = None
             
             # Process analysis in parallel if enabled
-            if self.config['enable_parallel_processing']:
-                analysis_data = self.process_route_parallel(ordered_points, vehicle_type, gmaps, api_key)
+            if config['enable_parallel_processing']:
+                analysis_data = self.process_route_parallel(ordered_points, vehicle_type, gmaps, api_key,
+                                                            progress_callback, config, weather_api_key)
             else:
-                analysis_data = self.process_route_sequential(ordered_points, vehicle_type, gmaps, api_key)
+                analysis_data = self.process_route_sequential(ordered_points, vehicle_type, gmaps, api_key,
+                                                              progress_callback, config, weather_api_key)
+            
+            self.report_progress(progress_callback, 90)
             
             # Add metadata
             analysis_data.update({
                 'from': f"{bounds['from_lat']:.6f}, {bounds['from_lng']:.6f}",
                 'to': f"{bounds['to_lat']:.6f}, {bounds['to_lng']:.6f}",
                 'vehicle_type': vehicle_type,
-                'original_points': original_points[:100],  # Limit stored original points
+                'original_points': ingest_stats['original_points'].tolist(),  # Limit stored original points
                 'filtered_points': ordered_points,
-                'points_filtered': len(original_points) - len(ordered_points),
-                'processing_time': round(time.time() - start_time, 2)
+                'total_points': ingest_stats['valid_points'],
+                'points_in_bounds': ingest_stats['points_in_bounds'],
+                'points_filtered': ingest_stats['valid_points'] - len(ordered_points),
+                'processing_time': round(time.time() - start_time, 2),
+                'weather_fetched_at': time.time()
             })
             
             logger.info(f"Route analysis completed in {analysis_data['processing_time']} seconds")
@@ -179,37 +380,49 @@ class CSVRouteAnalyzer:
                 'success': True,
                 'data': analysis_data
             }
-            
+        
+        except RateLimitTimeout as e:
+            logger.warning(f"API capacity exhausted while processing CSV route: {e}")
+            return {'success': False, 'error': API_BUSY_MESSAGE}
         except Exception as e:
             logger.error(f"Error processing CSV route: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def process_route_parallel(self, points, vehicle_type, gmaps, api_key):
+    def process_route_parallel(self, points, vehicle_type, gmaps, api_key, progress_callback=None,
+                               config=None, weather_api_key=None):
         """Process route analysis using parallel processing"""
+        config = config or self.config
         results = {}
+        self.report_progress(progress_callback, 40)
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
             # Submit parallel tasks
             future_stats = executor.submit(self.calculate_route_statistics, points)
-            future_turns = executor.submit(self.find_sharp_turns_optimized, points)
-            future_pois = executor.submit(self.find_pois_optimized, gmaps, points)
-            future_elevation = executor.submit(self.get_elevation_optimized, gmaps, points)
+            future_turns = executor.submit(self.find_sharp_turns_optimized, points, config=config)
+            future_pois = executor.submit(self.find_pois_optimized, gmaps, points, config)
+            future_elevation = executor.submit(self.get_elevation_optimized, gmaps, points, config)
+            future_weather = executor.submit(self.get_weather_optimized, points, weather_api_key, config)
             
             # Collect results with timeout
             try:
                 results['stats'] = future_stats.result(timeout=30)
+                self.report_progress(progress_callback, 50)
                 results['sharp_turns'] = future_turns.result(timeout=30)
-                results['pois'] = future_pois.result(timeout=60)
+                self.report_progress(progress_callback, 60)
                 results['elevation'] = future_elevation.result(timeout=60)
+                self.report_progress(progress_callback, 70)
+                results['pois'] = future_pois.result(timeout=60)
+                results['weather'] = future_weather.result(timeout=60)
             except concurrent.futures.TimeoutError:
                 logger.warning("Some analysis tasks timed out, using partial results")
                 results['stats'] = self.calculate_route_statistics(points)
                 results['sharp_turns'] = []
                 results['pois'] = {}
                 results['elevation'] = []
+                results['weather'] = []
         
         # Sequential processing for dependent tasks
-        results['weather'] = self.get_weather_optimized(points, api_key)
+        self.report_progress(progress_callback, 80)
         results['risk_segments'] = self.calculate_risk_optimized(points, results.get('sharp_turns', []))
         results['compliance'] = self.check_route_compliance_optimized(points, vehicle_type)
         results['emergency'] = self.analyze_emergency_optimized(points, results.get('pois', {}))
@@ -217,15 +430,22 @@ class CSVRouteAnalyzer:
         
         return self.format_analysis_results(results)
     
-    def process_route_sequential(self, points, vehicle_type, gmaps, api_key):
+    def process_route_sequential(self, points, vehicle_type, gmaps, api_key, progress_callback=None,
+                                 config=None, weather_api_key=None):
         """Process route analysis sequentially"""
+        config = config or self.config
         results = {}
         
+        self.report_progress(progress_callback, 40)
         results['stats'] = self.calculate_route_statistics(points)
-        results['sharp_turns'] = self.find_sharp_turns_optimized(points)
-        results['pois'] = self.find_pois_optimized(gmaps, points)
-        results['elevation'] = self.get_elevation_optimized(gmaps, points)
-        results['weather'] = self.get_weather_optimized(points, api_key)
+        self.report_progress(progress_callback, 50)
+        results['sharp_turns'] = self.find_sharp_turns_optimized(points, config=config)
+        self.report_progress(progress_callback, 60)
+        results['elevation'] = self.get_elevation_optimized(gmaps, points, config)
+        self.report_progress(progress_callback, 70)
+        results['pois'] = self.find_pois_optimized(gmaps, points, config)
+        results['weather'] = self.get_weather_optimized(points, weather_api_key, config)
+        self.report_progress(progress_callback, 80)
         results['risk_segments'] = self.calculate_risk_optimized(points, results.get('sharp_turns', []))
         results['compliance'] = self.check_route_compliance_optimized(points, vehicle_type)
         results['emergency'] = self.analyze_emergency_optimized(points, results.get('pois', {}))
@@ -233,41 +453,22 @@ class CSVRouteAnalyzer:
         
         return self.format_analysis_results(results)
     
-    def find_sharp_turns_optimized(self, points, angle_threshold=30):
-        """Find sharp turns with optimized sampling"""
-        if len(points) < 3:
-            return []
-        
-        sharp_turns = []
-        interval = max(1, self.config['sharp_turn_sample_interval'])
+    def find_sharp_turns_optimized(self, points, angle_threshold=30, config=None):
+        """Find sharp turns along the full route, resampled at the mode's turn spacing"""
+        config = config or self.config
         
-        for i in range(interval, len(points) - interval, interval):
-            try:
-                # Use points with larger intervals for more significant turns
-                p1 = points[max(0, i - interval)]
-                p2 = points[i]
-                p3 = points[min(len(points) - 1, i + interval)]
-                
-                angle = self.calculate_turn_angle(p1, p2, p3)
-                
-                if angle >= angle_threshold:
-                    sharp_turns.append({
-                        'lat': p2[0],
-                        'lng': p2[1],
-                        'angle': round(angle, 2),
-                        'index': i
-                    })
-            except Exception as e:
-                continue
+        sharp_turns = find_sharp_turns(points, angle_threshold, spacing_m=config['turn_spacing_m'])
         
         logger.info(f"Found {len(sharp_turns)} sharp turns")
         return sharp_turns
     
-    def find_pois_optimized(self, gmaps, points):
-        """Find POIs with minimal API calls"""
+    def find_pois_optimized(self, gmaps, points, config=None):
+        """Find POIs around a few strategic points with minimal API calls"""
         if not gmaps or len(points) < 2:
             return {}
         
+        config = config or self.config
+        
         poi_data = {
             'petrol_bunks': {},
             'hospitals': {},
@@ -295,49 +496,42 @@ class CSVRouteAnalyzer:
             'police_stations': 'police'
         }
         
-        for point in strategic_points[:self.config['poi_search_points']]:
-            for category, place_type in categories.items():
-                try:
-                    result = gmaps.places_nearby(
-                        location=(point[0], point[1]),
-                        radius=3000,  # 3km radius
-                        type=place_type
-                    )
-                    
-                    for place in result.get('results', [])[:3]:  # Limit to top 3
-                        poi_data[category][place['name']] = place.get('vicinity', 'Unknown location')
-                        
-                except Exception as e:
-                    logger.warning(f"POI search error for {category}: {e}")
-                    continue
+        # All searches run concurrently; each keeps its top 3 results
+        places = fetch_pois(gmaps, strategic_points[:config['poi_search_points']], categories,
+                            radius=3000, max_results=3)
+        for category, category_places in places.items():
+            for place in category_places:
+                poi_data[category][place['name']] = place.get('vicinity', 'Unknown location')
         
         return poi_data
     
-    def get_elevation_optimized(self, gmaps, points):
-        """Get elevation data with reduced API calls"""
+    def get_elevation_optimized(self, gmaps, points, config=None):
+        """Get an elevation profile along the route in a few batched requests"""
         if not gmaps or len(points) < 2:
             return []
         
-        # Sample points for elevation
-        sample_size = min(self.config['elevation_sample_points'], len(points))
-        if sample_size >= len(points):
-            sample_points = points
-        else:
-            step = len(points) // sample_size
-            sample_points = points[::step]
+        config = config or self.config
         
         try:
-            elevation_data = get_elevation_data(gmaps, sample_points, sample_interval=1)
-            return elevation_data[:20]  # Limit results
+            return get_elevation_data(gmaps, points, max_samples=config['elevation_sample_points'])
+        except RateLimitTimeout:
+            raise
         except Exception as e:
             logger.warning(f"Elevation data error: {e}")
             return []
     
-    def get_weather_optimized(self, points, api_key):
-        """Get weather data with minimal API calls"""
+    def get_weather_optimized(self, points, api_key, config=None):
+        """
+        Get weather at the start, middle and end of the route
+        
+        api_key is the OpenWeather key. Requests run concurrently through the
+        shared weather session, with config['api_timeout'] as read timeout.
+        """
         if len(points) < 2:
             return []
         
+        config = config or self.config
+        
         # Use only 3 strategic points for weather
         weather_points = [
             points[0],                    # Start
@@ -345,28 +539,10 @@ class CSVRouteAnalyzer:
             points[-1]                    # End
         ]
         
-        weather_data = []
-        for point in weather_points[:self.config['weather_sample_points']]:
-            try:
-                import requests
-                url = f"https://api.openweathermap.org/data/2.5/weather?lat={point[0]}&lon={point[1]}&appid={api_key}&units=metric"
-                response = requests.get(url, timeout=self.config['api_timeout'])
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    weather_data.append({
-                        "lat": point[0],
-                        "lng": point[1],
-                        "location": data.get("name", f"{point[0]:.3f},{point[1]:.3f}"),
-                        "temp": data['main']['temp'],
-                        "description": data['weather'][0]['description'],
-                        "icon": data['weather'][0]['icon']
-                    })
-            except Exception as e:
-                logger.warning(f"Weather API error: {e}")
-                continue
-        
-        return weather_data
+        return get_weather_for_points(
+            weather_points[:config['weather_sample_points']], api_key,
+            timeout=(DEFAULT_WEATHER_TIMEOUT[0], config['api_timeout'])
+        )
     
     def calculate_risk_optimized(self, points, sharp_turns):
         """Calculate risk with reduced complexity"""
@@ -526,70 +702,28 @@ class CSVRouteAnalyzer:
     # EXISTING METHODS - Keep all existing methods from original
     
     def filter_points_by_bounds(self, points, bounds):
-        """Filter points to only include those within specified bounds"""
-        filtered = []
-        
-        # Create bounding box
-        min_lat = min(bounds['from_lat'], bounds['to_lat'])
-        max_lat = max(bounds['from_lat'], bounds['to_lat'])
-        min_lng = min(bounds['from_lng'], bounds['to_lng'])
-        max_lng = max(bounds['from_lng'], bounds['to_lng'])
-        
-        for point in points:
-            lat, lng = point[0], point[1]
-            if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
-                filtered.append(point)
+        """
+        Filter points to only include those selected by bounds
         
-        return filtered
+        One vectorized mask over the coordinate arrays; see
+        spatial_filter.bounds_mask for the bbox, polygon and corridor modes.
+        """
+        points = as_points(points)
+        return points[bounds_mask(points, bounds)]
     
-    def order_route_points(self, points, bounds):
-        """Order points to create a logical route from start to end bounds"""
-        if not points:
-            return []
-        
-        # Start with the point closest to the 'from' coordinates
-        start_point = (bounds['from_lat'], bounds['from_lng'])
-        end_point = (bounds['to_lat'], bounds['to_lng'])
-        
-        # Find closest point to start
-        distances_to_start = []
-        for i, point in enumerate(points):
-            dist = geodesic(start_point, (point[0], point[1])).meters
-            distances_to_start.append((dist, i, point))
-        
-        distances_to_start.sort()
-        
-        # Simple ordering: sort by distance from start to end
-        ordered = []
-        remaining_points = points.copy()
+    def order_route_points(self, points, bounds, mode='auto'):
+        """
+        Order points to create a logical route from start to end bounds
         
-        # Start with closest point to start
-        current_point = distances_to_start[0][2]
-        remaining_points.remove(current_point)
-        ordered.append(current_point)
+        See route_ordering.order_points for the ordering modes.
+        """
+        if len(points) == 0:
+            return []
         
-        # Greedy approach: always pick the nearest unvisited point
-        while remaining_points:
-            current_pos = (ordered[-1][0], ordered[-1][1])
-            
-            nearest_dist = float('inf')
-            nearest_point = None
-            
-            for point in remaining_points:
-                point_pos = (point[0], point[1])
-                dist = geodesic(current_pos, point_pos).meters
-                
-                if dist < nearest_dist:
-                    nearest_dist = dist
-                    nearest_point = point
-            
-            if nearest_point:
-                ordered.append(nearest_point)
-                remaining_points.remove(nearest_point)
-            else:
-                break
+        points = as_points(points)
+        order = order_points(points, (bounds['from_lat'], bounds['from_lng']), mode)
         
-        return ordered
+        return points[order].tolist()
     
     def calculate_route_statistics(self, points):
         """Calculate basic route statistics"""
@@ -601,12 +735,7 @@ class CSVRouteAnalyzer:
                 'duration_text': '0 mins'
             }
         
-        total_distance = 0
-        for i in range(len(points) - 1):
-            point1 = (points[i][0], points[i][1])
-            point2 = (points[i+1][0], points[i+1][1])
-            distance = geodesic(point1, point2).meters
-            total_distance += distance
+        total_distance = path_length_m(points)
         
         # Estimate duration based on average speed (50 km/h for mixed roads)
         avg_speed_ms = 50 * 1000 / 3600  # 50 km/h in m/s
@@ -634,74 +763,74 @@ class CSVRouteAnalyzer:
             'duration_text': duration_text
         }
     
-    def calculate_turn_angle(self, p1, p2, p3):
-        """Calculate the turn angle at point p2 between p1-p2-p3"""
-        try:
-            # Calculate bearings
-            bearing1 = self.calculate_bearing(p1, p2)
-            bearing2 = self.calculate_bearing(p2, p3)
-            
-            # Calculate turn angle
-            angle = abs(bearing2 - bearing1)
-            if angle > 180:
-                angle = 360 - angle
-            
-            return angle
-        except:
-            return 0
-    
-    def calculate_bearing(self, p1, p2):
-        """Calculate bearing between two points"""
-        lat1, lng1 = math.radians(p1[0]), math.radians(p1[1])
-        lat2, lng2 = math.radians(p2[0]), math.radians(p2[1])
-        
-        dlon = lng2 - lng1
-        
-        y = math.sin(dlon) * math.cos(lat2)
-        x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
-        
-        bearing = math.atan2(y, x)
-        bearing = math.degrees(bearing)
-        bearing = (bearing + 360) % 360
-        
-        return bearing
-    
     def count_points_in_bounds(self, points, bounds):
         """Count how many points fall within specified bounds"""
         try:
-            return len(self.filter_points_by_bounds(points, bounds))
-        except:
+            if len(points) == 0:
+                return 0
+            return int(bounds_mask(points, bounds).sum())
+        except Exception as e:
+            logger.error(f"Error counting points in bounds: {e}")
             return 0
     
     def prepare_export_data(self, route, route_data, risk_segments):
-        """Prepare data for CSV export"""
+        """
+        Prepare data for CSV export
+        
+        Turns, elevation samples and risk segments are placed on the route by
+        their chainage (distance along it), so every exported point picks up
+        the segment it lies in and the elevation interpolated at its position.
+        """
         export_data = []
         
         try:
             filtered_points = route_data.get('filtered_points', [])
-            sharp_turns = {(t['lat'], t['lng']): t for t in route_data.get('sharp_turns', [])}
-            
-            # Create a mapping of points to risk segments
-            risk_mapping = {}
+            route_index = RouteIndex(filtered_points)
+            
+            # Sharp turns, keyed by the nearest route vertex
+            sharp_turns = {}
+            turns = route_data.get('sharp_turns', [])
+            if turns and len(route_index):
+                turn_chainage, _, _ = route_index.locate([(t['lat'], t['lng']) for t in turns])
+                for turn, vertex in zip(turns, route_index.nearest_vertex(turn_chainage)):
+                    sharp_turns[int(vertex)] = turn
+            
+            # Risk segments as chainage ranges, looked up by binary search
+            segment_starts = []
+            segment_info = []
             for i, segment in enumerate(risk_segments):
-                for point in segment.get('points', []):
-                    key = (round(point[0], 6), round(point[1], 6))
-                    risk_mapping[key] = {
-                        'segment_id': i,
-                        'risk_level': segment.get('risk_level', 'LOW'),
-                        'risk_score': segment.get('risk_score', 0)
-                    }
-            
-            # Elevation data mapping
-            elevation_mapping = {}
-            for elev in route_data.get('elevation', []):
-                key = (round(elev['location']['lat'], 6), round(elev['location']['lng'], 6))
-                elevation_mapping[key] = elev['elevation']
+                points = segment.get('points', [])
+                if not points or not len(route_index):
+                    continue
+                start_chainage, _, _ = route_index.locate([points[0]])
+                segment_starts.append(start_chainage[0])
+                segment_info.append({
+                    'segment_id': i,
+                    'risk_level': segment.get('risk_level', 'LOW'),
+                    'risk_score': segment.get('risk_score', 0)
+                })
+            order = np.argsort(segment_starts, kind='stable')
+            segment_starts = np.asarray(segment_starts)[order]
+            segment_info = [segment_info[k] for k in order]
+            
+            # Elevation interpolated along the route from the sampled points
+            elevations = None
+            elevation_data = route_data.get('elevation', [])
+            if elevation_data and len(route_index):
+                elev_chainage, _, _ = route_index.locate(
+                    [(e['location']['lat'], e['location']['lng']) for e in elevation_data]
+                )
+                elev_order = np.argsort(elev_chainage)
+                elevations = np.interp(route_index.cumulative, elev_chainage[elev_order],
+                                       np.asarray([e['elevation'] for e in elevation_data])[elev_order])
+            
+            if len(segment_starts):
+                point_segments = np.searchsorted(segment_starts, route_index.cumulative, side='right') - 1
             
             # Process each point
-            for point in filtered_points:
+            for k, point in enumerate(filtered_points):
                 lat, lng = point[0], point[1]
-                key = (round(lat, 6), round(lng, 6))
+                turn = sharp_turns.get(k)
                 
                 point_data = {
                     'lat': lat,
@@ -709,14 +838,14 @@ class CSVRouteAnalyzer:
                     'risk_level': 'LOW',
                     'risk_score': 0,
                     'segment_id': 0,
-                    'is_sharp_turn': key in sharp_turns,
-                    'elevation': elevation_mapping.get(key, 0),
-                    'turn_angle': sharp_turns.get(key, {}).get('angle', 0)
+                    'is_sharp_turn': turn is not None,
+                    'elevation': round(float(elevations[k]), 1) if elevations is not None else 0,
+                    'turn_angle': turn.get('angle', 0) if turn else 0
                 }
                 
                 # Add risk information if available
-                if key in risk_mapping:
-                    point_data.update(risk_mapping[key])
+                if len(segment_starts) and point_segments[k] >= 0:
+                    point_data.update(segment_info[point_segments[k]])
                 
                 export_data.append(point_data)
             
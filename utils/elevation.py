@@ -1,60 +1,104 @@
 import logging
+import concurrent.futures
+import numpy as np
 import googlemaps
-from geopy.distance import geodesic
+from .geo import distance_m
+from .route_index import RouteIndex
+from .rate_limit import RateLimitTimeout
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def get_elevation_data(gmaps, route_points, sample_interval=20):
+# The Elevation API accepts at most 512 locations per request
+MAX_LOCATIONS_PER_REQUEST = 512
+
+def sample_route(route_points, spacing_m=100, max_samples=1024):
+    """
+    Evenly spaced sample positions along a route
+    
+    Samples are placed every spacing_m meters of distance along the
+    polyline (not every Nth vertex), always including both ends. Long routes
+    get a wider spacing so that at most max_samples are returned.
+    
+    Returns:
+        tuple: (distances along the route in meters, float64 (N, 2) positions)
+    """
+    index = RouteIndex(route_points)
+    if len(index) == 0:
+        return np.zeros(0), np.empty((0, 2))
+    if index.length_m == 0:
+        return np.zeros(1), index.points[:1]
+    
+    count = int(np.clip(np.ceil(index.length_m / spacing_m) + 1, 2, max(max_samples, 2)))
+    distances = np.linspace(0, index.length_m, count)
+    return distances, index.point_at(distances)
+
+def get_elevation_data(gmaps, route_points, spacing_m=100, max_samples=1024, max_workers=4):
     """
-    Get elevation data for points along a route
+    Get an elevation profile along a route
+    
+    Positions are sampled along the polyline by sample_route() and sent in
+    batches of up to MAX_LOCATIONS_PER_REQUEST locations, with the batches
+    fetched concurrently. A 500 km route at the default settings costs two
+    round trips. A batch that fails is logged and left out of the profile;
+    a RateLimitTimeout is raised instead.
     
     Args:
         gmaps: Google Maps client instance
         route_points: List of route coordinates [lat, lng]
-        sample_interval: Sample every Nth point to reduce API calls
+        spacing_m: Target distance between samples in meters
+        max_samples: Upper bound on the number of samples
+        max_workers: Batches requested at the same time
     
     Returns:
-        List of dicts with elevation data
+        List of dicts with location, elevation, resolution and distance
+        (meters along the route), in route order
     """
-    if not route_points:
+    if route_points is None or len(route_points) == 0:
         return []
-        
-    elevation_data = []
     
     try:
-        # Sample route points to reduce API calls
-        sampled_points = route_points[::sample_interval]
-        
-        # Cap the number of points to avoid exceeding API limits
-        max_points = 100
-        if len(sampled_points) > max_points:
-            step = len(sampled_points) // max_points
-            sampled_points = sampled_points[::step]
-        
-        # Prepare locations for API call
-        locations = [{'lat': point[0], 'lng': point[1]} for point in sampled_points]
+        distances, positions = sample_route(route_points, spacing_m, max_samples)
+        batches = [
+            (distances[start:start + MAX_LOCATIONS_PER_REQUEST],
+             positions[start:start + MAX_LOCATIONS_PER_REQUEST])
+            for start in range(0, len(positions), MAX_LOCATIONS_PER_REQUEST)
+        ]
         
-        # Make API call
-        if not locations:
-            return []
-            
-        results = gmaps.elevation(locations)
-        
-        # Process results
-        for i, result in enumerate(results):
-            if 'elevation' in result:
-                elevation_data.append({
+        def fetch(batch):
+            batch_distances, batch_positions = batch
+            results = gmaps.elevation([(float(lat), float(lng)) for lat, lng in batch_positions])
+            return [
+                {
                     'location': {
                         'lat': result['location']['lat'],
                         'lng': result['location']['lng']
                     },
                     'elevation': result['elevation'],
-                    'resolution': result.get('resolution', 0)
-                })
-                
+                    'resolution': result.get('resolution', 0),
+                    'distance': round(float(distance), 1)
+                }
+                for distance, result in zip(batch_distances, results) if 'elevation' in result
+            ]
+        
+        elevation_data = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures = [executor.submit(fetch, batch) for batch in batches]
+            # Collect in submission order so the profile stays in route order
+            for future in futures:
+                try:
+                    elevation_data.extend(future.result())
+                except RateLimitTimeout:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                except Exception as e:
+                    logger.error(f"Error getting elevation batch: {e}")
+        
         return elevation_data
     
+    except RateLimitTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error getting elevation data: {e}")
         return []
@@ -70,7 +114,7 @@ def calculate_slope(point1, point2):
         lat2, lng2 = point2['location']['lat'], point2['location']['lng']
         
         # Calculate horizontal distance in meters
-        horizontal_distance = geodesic((lat1, lng1), (lat2, lng2)).meters
+        horizontal_distance = float(distance_m((lat1, lng1), (lat2, lng2)))
         
         if horizontal_distance == 0:
             return 0
@@ -1,7 +1,9 @@
 import math
 import random
 import logging
-from geopy.distance import geodesic
+import numpy as np
+from .geo import distance_m
+from .route_index import RouteIndex
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -51,10 +53,25 @@ def categorize_emergency_services(hospitals, police_stations, petrol_bunks):
     
     return emergency_services
 
-def find_critical_emergency_points(route_points, emergency_services, max_distance_km=5):
+# Place categories that count as emergency services, by emergency_services key
+EMERGENCY_CATEGORIES = {
+    "hospitals": "hospitals",
+    "police_stations": "police_stations",
+    "petrol_bunks": "fuel_stations"
+}
+
+def find_critical_emergency_points(route_points, emergency_services, max_distance_km=5, places=None):
     """
     Identify points along the route that are farther than max_distance_km from emergency services
+    
+    places, when given, are the place records saved with the route. The
+    distance from a route point to a service is then the distance along
+    the route between them plus how far the service lies off it, using
+    the records' route_chainage_km and route_offset_km.
     """
+    if places is not None:
+        return _find_critical_points_by_chainage(route_points, places, max_distance_km)
+    
     critical_points = []
     
     # Create a list of all emergency service locations
@@ -83,28 +100,16 @@ def find_critical_emergency_points(route_points, emergency_services, max_distanc
         point_coord = (point[0], point[1])
         
         # Find the closest emergency service
-        closest_service = None
-        closest_distance = float('inf')
+        # This is a simplified approach - in a real implementation, 
+        # you would geocode the vicinity address to get coordinates.
+        # Here we're approximating based on route position with a random offset,
+        # giving each service a reasonable but random location close to the point
+        service_coords = np.asarray(point_coord) + (np.random.random((len(all_services), 2)) * 0.1 - 0.05)
+        distances = distance_m(point_coord, service_coords) / 1000
         
-        for service in all_services:
-            # This is a simplified approach - in a real implementation, 
-            # you would geocode the vicinity address to get coordinates
-            try:
-                # In a real implementation, you would have the actual coordinates
-                # Here we're approximating based on route position with a random offset
-                # Create a reasonable but random location relatively close to the route point
-                service_lat = point[0] + (random.random() * 0.1 - 0.05)
-                service_lng = point[1] + (random.random() * 0.1 - 0.05)
-                service_coord = (service_lat, service_lng)
-                
-                distance = geodesic(point_coord, service_coord).kilometers
-                
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_service = service
-            except Exception as e:
-                logger.error(f"Error calculating distance to emergency service: {e}")
-                continue
+        nearest = int(np.argmin(distances))
+        closest_service = all_services[nearest]
+        closest_distance = float(distances[nearest])
         
         # If the closest service is farther than the maximum allowed distance
         if closest_distance > max_distance_km:
@@ -118,6 +123,37 @@ def find_critical_emergency_points(route_points, emergency_services, max_distanc
     
     return critical_points
 
+def _find_critical_points_by_chainage(route_points, places, max_distance_km):
+    """find_critical_emergency_points() for services with a known position along the route"""
+    services = [place for place in places if place.get("category") in EMERGENCY_CATEGORIES]
+    if not services or len(route_points) == 0:
+        return []
+    
+    route_index = RouteIndex(route_points)
+    check_interval = max(1, len(route_index) // 20)  # Check every ~5% of the route
+    indices = np.arange(0, len(route_index), check_interval)
+    
+    service_chainage = np.array([service["route_chainage_km"] for service in services])
+    service_offset = np.array([service.get("route_offset_km", 0.0) for service in services])
+    point_chainage = route_index.cumulative[indices] / 1000
+    distances = np.abs(point_chainage[:, None] - service_chainage[None, :]) + service_offset[None, :]
+    nearest = np.argmin(distances, axis=1)
+    
+    critical_points = []
+    for row, (i, j) in enumerate(zip(indices, nearest)):
+        closest_distance = float(distances[row, j])
+        if closest_distance > max_distance_km:
+            point = route_index.points[i]
+            critical_points.append({
+                "index": int(i),
+                "coordinates": {"lat": float(point[0]), "lng": float(point[1])},
+                "closest_service": services[j]["name"],
+                "closest_service_type": EMERGENCY_CATEGORIES[services[j]["category"]],
+                "distance_km": closest_distance
+            })
+    
+    return critical_points
+
 def generate_emergency_contact_list(route_data, emergency_services):
     """
     Generate a list of emergency contacts along the route
@@ -260,24 +296,24 @@ def find_nearby_emergency_services(route_point, emergency_services, radius_km=10
     
     # Loop through all service types
     for service_type, services in emergency_services.items():
-        for service in services:
-            # In a real implementation, the service would have actual coordinates
-            # For this example, we'll generate random nearby coordinates
-            try:
-                service_lat = route_point[0] + (random.random() * 0.1 - 0.05)
-                service_lng = route_point[1] + (random.random() * 0.1 - 0.05)
-                service_coord = (service_lat, service_lng)
-                
-                distance = geodesic(point_coord, service_coord).kilometers
-                
+        if not services:
+            continue
+        
+        # In a real implementation, the service would have actual coordinates
+        # For this example, we'll generate random nearby coordinates
+        try:
+            service_coords = np.asarray(point_coord) + (np.random.random((len(services), 2)) * 0.1 - 0.05)
+            distances = distance_m(point_coord, service_coords) / 1000
+            
+            for service, (service_lat, service_lng), distance in zip(services, service_coords.tolist(), distances.tolist()):
                 if distance <= radius_km:
                     service_copy = service.copy()
                     service_copy["distance_km"] = round(distance, 2)
                     service_copy["coordinates"] = {"lat": service_lat, "lng": service_lng}
                     
                     nearby_services[service_type].append(service_copy)
-            except Exception as e:
-                logger.error(f"Error finding nearby emergency services: {e}")
+        except Exception as e:
+            logger.error(f"Error finding nearby emergency services: {e}")
     
     return nearby_services
 
@@ -1,7 +1,7 @@
 import os
 import json
 import logging
-from geopy.distance import geodesic
+from .geo import zone_distances_km
 import random  # For demo data generation
 
 # Set up logger
@@ -157,17 +157,25 @@ class EnvironmentalAnalyzer:
         
         # Check each point in the route against all sensitive zones
         sample_interval = max(1, len(route_points) // 20)  # Check approximately every 5% of route
+        sample_indices = list(range(0, len(route_points), sample_interval))
+        sample_points = [(route_points[i][0], route_points[i][1]) for i in sample_indices]
         
-        for i in range(0, len(route_points), sample_interval):
-            if i >= len(route_points):
-                break
-                
-            point_coord = (route_points[i][0], route_points[i][1])
+        protected_areas = self.protected_areas.get("protected_areas", [])
+        emission_zones = self.emission_zones.get("emission_control_areas", [])
+        noise_zones = self.noise_restriction_zones.get("noise_restriction_zones", [])
+        corridors = self.wildlife_corridors.get("wildlife_corridors", [])
+        
+        # Distances (km) from every sampled point to every zone center at once
+        protected_km = zone_distances_km(sample_points, protected_areas)
+        emission_km = zone_distances_km(sample_points, emission_zones)
+        noise_km = zone_distances_km(sample_points, noise_zones)
+        corridor_km = zone_distances_km(sample_points, corridors)
+        
+        for row, i in enumerate(sample_indices):
+            point_coord = sample_points[row]
             
             # Check protected areas
-            for area in self.protected_areas.get("protected_areas", []):
-                area_center = (area["coordinates"]["lat"], area["coordinates"]["lng"])
-                distance = geodesic(point_coord, area_center).kilometers
+            for area, distance in zip(protected_areas, protected_km[row]):
                 
                 if distance <= area["radius_km"]:
                     sensitive_areas.append({
@@ -179,9 +187,7 @@ class EnvironmentalAnalyzer:
                     })
             
             # Check emission control areas
-            for zone in self.emission_zones.get("emission_control_areas", []):
-                zone_center = (zone["coordinates"]["lat"], zone["coordinates"]["lng"])
-                distance = geodesic(point_coord, zone_center).kilometers
+            for zone, distance in zip(emission_zones, emission_km[row]):
                 
                 if distance <= zone["radius_km"]:
                     sensitive_areas.append({
@@ -193,9 +199,7 @@ class EnvironmentalAnalyzer:
                     })
             
             # Check noise restriction zones
-            for zone in self.noise_restriction_zones.get("noise_restriction_zones", []):
-                zone_center = (zone["coordinates"]["lat"], zone["coordinates"]["lng"])
-                distance = geodesic(point_coord, zone_center).kilometers
+            for zone, distance in zip(noise_zones, noise_km[row]):
                 
                 if distance <= zone["radius_km"]:
                     sensitive_areas.append({
@@ -207,9 +211,7 @@ class EnvironmentalAnalyzer:
                     })
             
             # Check wildlife corridors
-            for corridor in self.wildlife_corridors.get("wildlife_corridors", []):
-                corridor_center = (corridor["coordinates"]["lat"], corridor["coordinates"]["lng"])
-                distance = geodesic(point_coord, corridor_center).kilometers
+            for corridor, distance in zip(corridors, corridor_km[row]):
                 
                 if distance <= corridor["radius_km"]:
                     sensitive_areas.append({
@@ -0,0 +1,240 @@
+import numpy as np
+import logging
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Mean Earth radius (IUGG) used by the spherical formulas
+EARTH_RADIUS_M = 6371008.8
+
+# WGS-84 ellipsoid used by the high-accuracy (Vincenty) formulas
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+def as_points(points):
+    """
+    Convert points to a float64 (N, 2) array of [lat, lng]
+    
+    Accepts an array, a list of (lat, lng) pairs or a single pair.
+    """
+    arr = np.asarray(points, dtype=np.float64)
+    if arr.size == 0:
+        return np.empty((0, 2))
+    if arr.ndim == 1:
+        arr = arr.reshape(1, 2)
+    return arr[:, :2]
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters; arguments broadcast like NumPy arrays"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def vincenty_m(lat1, lng1, lat2, lng2, max_iterations=200, tolerance=1e-12):
+    """
+    Distance on the WGS-84 ellipsoid in meters (Vincenty's inverse formula)
+    
+    Accurate to well under a millimetre, at several times the cost of
+    haversine_m. Nearly antipodal pairs that do not converge fall back to
+    the great-circle distance.
+    """
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(
+        *(np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    )
+    
+    f = WGS84_F
+    L = lng2 - lng1
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+    
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cosU2 * sin_lam) ** 2 +
+                                (cosU1 * sinU2 - sinU1 * cosU2 * cos_lam) ** 2)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - lam_prev) <= tolerance
+            if np.all(converged):
+                break
+        
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distance = WGS84_B * A * (sigma - delta_sigma)
+    
+    if not np.all(converged):
+        logger.debug("Vincenty did not converge for some pairs, using great-circle distance")
+        fallback = haversine_m(np.degrees(lat1), np.degrees(lng1), np.degrees(lat2), np.degrees(lng2))
+        distance = np.where(converged, distance, fallback)
+    
+    return distance
+
+def _distance_fn(ellipsoidal):
+    return vincenty_m if ellipsoidal else haversine_m
+
+def distance_m(a, b, ellipsoidal=False):
+    """
+    Distance in meters between points a and b
+    
+    a and b are (lat, lng) pairs or (N, 2) arrays and broadcast against each
+    other, so one point against many gives an array of N distances.
+    Set ellipsoidal=True for WGS-84 accuracy instead of the spherical model.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return _distance_fn(ellipsoidal)(a[..., 0], a[..., 1], b[..., 0], b[..., 1])
+
+def pairwise_distance_m(a, b, ellipsoidal=False):
+    """Distance matrix in meters between every point of a (N) and of b (M), shape (N, M)"""
+    a = as_points(a)
+    b = as_points(b)
+    return _distance_fn(ellipsoidal)(a[:, 0:1], a[:, 1:2], b[:, 0], b[:, 1])
+
+def min_distance_m(a, b, ellipsoidal=False, block_size=2048):
+    """
+    Distance in meters from each point of a to its nearest point in b
+    
+    Works through a in blocks so that memory stays bounded for long routes.
+    
+    Returns:
+        float64 array of shape (N,), inf where b is empty
+    """
+    a = as_points(a)
+    b = as_points(b)
+    if len(b) == 0:
+        return np.full(len(a), np.inf)
+    
+    result = np.empty(len(a))
+    for start in range(0, len(a), block_size):
+        block = pairwise_distance_m(a[start:start + block_size], b, ellipsoidal)
+        result[start:start + block_size] = block.min(axis=1)
+    return result
+
+def zone_distances_km(points, zones):
+    """
+    Distance matrix in km from each point to the center of each zone, shape (points, zones)
+    
+    zones are dicts with a ``coordinates`` entry holding ``lat`` and ``lng``,
+    as in the compliance and environmental data files.
+    """
+    centers = [(zone["coordinates"]["lat"], zone["coordinates"]["lng"]) for zone in zones]
+    return pairwise_distance_m(points, centers) / 1000
+
+def segment_lengths_m(points, ellipsoidal=False):
+    """Lengths in meters of the N-1 legs between consecutive points"""
+    points = as_points(points)
+    if len(points) < 2:
+        return np.zeros(0)
+    return distance_m(points[:-1], points[1:], ellipsoidal)
+
+def cumulative_distance_m(points, ellipsoidal=False):
+    """Distance in meters along the path at each of its N points (starting at 0)"""
+    points = as_points(points)
+    cumulative = np.zeros(len(points))
+    if len(points) > 1:
+        np.cumsum(segment_lengths_m(points, ellipsoidal), out=cumulative[1:])
+    return cumulative
+
+def path_length_m(points, ellipsoidal=False):
+    """Total length in meters of the path through points"""
+    return float(segment_lengths_m(points, ellipsoidal).sum())
+
+def project_to_plane(points, origin_lat=None):
+    """
+    Project points to a local equirectangular plane in meters
+    
+    Distances in the plane are accurate to well under 1% over a few hundred
+    km around origin_lat (the mean latitude of the points by default), which
+    is enough for spatial indexing and nearest-neighbour searches.
+    
+    Returns:
+        float64 (N, 2) array of [x, y] in meters
+    """
+    points = as_points(points)
+    if len(points) == 0:
+        return np.empty((0, 2))
+    if origin_lat is None:
+        origin_lat = float(points[:, 0].mean())
+    
+    lat = np.radians(points[:, 0])
+    lng = np.radians(points[:, 1])
+    return np.column_stack((EARTH_RADIUS_M * lng * np.cos(np.radians(origin_lat)),
+                            EARTH_RADIUS_M * lat))
+
+def initial_bearing(a, b):
+    """Initial bearing in degrees [0, 360) from a to b; arguments broadcast like distance_m"""
+    a = np.radians(np.asarray(a, dtype=np.float64))
+    b = np.radians(np.asarray(b, dtype=np.float64))
+    lat1, lng1 = a[..., 0], a[..., 1]
+    lat2, lng2 = b[..., 0], b[..., 1]
+    
+    y = np.sin(lng2 - lng1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lng2 - lng1)
+    
+    return np.degrees(np.arctan2(y, x)) % 360
+
+def bearings(points):
+    """Initial bearings in degrees of the N-1 legs between consecutive points"""
+    points = as_points(points)
+    if len(points) < 2:
+        return np.zeros(0)
+    return initial_bearing(points[:-1], points[1:])
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash(lat, lng, precision=5):
+    """
+    Geohash cell of a point
+    
+    Cells are about 5 x 5 km at precision 5 and 39 x 20 km at precision 4;
+    points in the same cell share the same string.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        coord, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            bounds[0] = mid
+        else:
+            value <<= 1
+            bounds[1] = mid
+        even = not even
+        
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    
+    return ''.join(chars)
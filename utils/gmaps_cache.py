@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import numbers
+from flask import current_app, has_app_context
+from .cache import SQLiteCache
+from .rate_limit import RateLimitedGoogleMapsClient, get_google_buckets
+from .api_transport import OFFLINE_API_KEY, get_transport_session, is_offline
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# How long responses stay valid, per endpoint (seconds)
+ENDPOINT_TTLS = {
+    'places_nearby': 24 * 3600,
+    'reverse_geocode': 30 * 24 * 3600,
+    'elevation': 90 * 24 * 3600,
+    'directions': 6 * 3600
+}
+
+# Decimal places coordinates are rounded to before building keys.
+# 3 places is ~110 m (fine for multi-km place searches), 5 is ~1 m.
+ENDPOINT_PRECISION = {
+    'places_nearby': 3,
+    'reverse_geocode': 4,
+    'elevation': 5,
+    'directions': 4
+}
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+def quantize(value, digits):
+    """
+    Normalize request arguments for use in a cache key
+    
+    (lat, lng) pairs and {'lat', 'lng'} dicts become rounded [lat, lng]
+    lists, strings are trimmed and lower-cased, and containers are
+    normalized recursively. Anything else is kept as is.
+    """
+    if isinstance(value, dict):
+        lat = value.get('lat', value.get('latitude'))
+        lng = value.get('lng', value.get('longitude'))
+        if _is_number(lat) and _is_number(lng) and len(value) == 2:
+            return [round(float(lat), digits), round(float(lng), digits)]
+        return {k: quantize(v, digits) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        if len(value) == 2 and all(_is_number(v) for v in value):
+            return [round(float(value[0]), digits), round(float(value[1]), digits)]
+        return [quantize(v, digits) for v in value]
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    return value
+
+class CachedGoogleMapsClient:
+    """
+    googlemaps.Client wrapper that serves repeated requests from a local cache
+    
+    places_nearby, reverse_geocode, elevation and directions responses are
+    stored in a SQLiteCache (shared by every worker on the host) under a key
+    built from the endpoint and its quantized arguments, with a TTL per
+    endpoint. Elevation is cached per location, so a corridor that overlaps
+    an earlier one only requests the new points. Other client methods are
+    passed straight through.
+    """
+    
+    def __init__(self, client, cache, ttls=None, precision=None):
+        self.client = client
+        self.cache = cache
+        self.ttls = dict(ENDPOINT_TTLS, **(ttls or {}))
+        self.precision = dict(ENDPOINT_PRECISION, **(precision or {}))
+        self.hits = 0
+        self.misses = 0
+    
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+    
+    def cache_key(self, endpoint, *args, **kwargs):
+        """Cache key for a call to endpoint with the given arguments"""
+        digits = self.precision[endpoint]
+        normalized = [endpoint, quantize(list(args), digits), quantize(kwargs, digits)]
+        payload = json.dumps(normalized, sort_keys=True, default=str)
+        return f"{endpoint}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    
+    def _cached_call(self, endpoint, *args, **kwargs):
+        key = self.cache_key(endpoint, *args, **kwargs)
+        entry = self.cache.get_entry(key)
+        if entry is not None:
+            self.hits += 1
+            return entry['value']
+        
+        self.misses += 1
+        result = getattr(self.client, endpoint)(*args, **kwargs)
+        # A cached page would hand out its next_page_token long after the
+        # token expired, so pages with more to follow are not stored
+        if not (isinstance(result, dict) and result.get('next_page_token')):
+            self.cache.set(key, result, ttl=self.ttls[endpoint])
+        return result
+    
+    def places_nearby(self, *args, **kwargs):
+        # Page tokens are short-lived and single use
+        if kwargs.get('page_token'):
+            return self.client.places_nearby(*args, **kwargs)
+        return self._cached_call('places_nearby', *args, **kwargs)
+    
+    def reverse_geocode(self, *args, **kwargs):
+        return self._cached_call('reverse_geocode', *args, **kwargs)
+    
+    def directions(self, *args, **kwargs):
+        return self._cached_call('directions', *args, **kwargs)
+    
+    def elevation(self, locations):
+        """Elevation for one location or a list of them, fetching only uncached points"""
+        single = isinstance(locations, dict) or (
+            isinstance(locations, (list, tuple)) and len(locations) == 2 and all(_is_number(v) for v in locations)
+        )
+        if single:
+            locations = [locations]
+        
+        digits = self.precision['elevation']
+        points = [tuple(quantize(location, digits)) for location in locations]
+        keys = [f"elevation:{lat:.{digits}f},{lng:.{digits}f}" for lat, lng in points]
+        
+        found = self.cache.get_many(keys)
+        uncached = [(key, point) for key, point in zip(keys, points) if key not in found]
+        missing = list(dict.fromkeys(uncached))
+        self.hits += len(keys) - len(uncached)
+        self.misses += len(uncached)
+        
+        if missing:
+            results = self.client.elevation([point for _, point in missing])
+            fetched = {key: result for (key, _), result in zip(missing, results)}
+            self.cache.set_many(fetched, ttl=self.ttls['elevation'])
+            found.update(fetched)
+        
+        return [found[key] for key in keys if key in found]
+
+def get_gmaps_cache():
+    """Get the shared Google Maps response cache for the current app"""
+    cache = current_app.extensions.get('gmaps_cache')
+    if cache is None:
+        cache = SQLiteCache(
+            current_app.config['GMAPS_CACHE_PATH'],
+            namespace='gmaps',
+            max_entries=current_app.config['GMAPS_CACHE_MAX_ENTRIES']
+        )
+        current_app.extensions['gmaps_cache'] = cache
+    return cache
+
+def create_gmaps_client(api_key):
+    """
+    Create a rate-limited Google Maps client, wrapped in the response cache when possible
+    
+    Every request takes a token from its web service's shared bucket and is
+    retried with backoff on quota and server errors. Requests go through
+    the configured API transport (see utils/api_transport.py), so they can
+    be recorded, replayed or synthesized. The cache is used inside an app
+    context with GMAPS_CACHE_ENABLED set.
+    """
+    session = get_transport_session()
+    if not api_key and is_offline():
+        api_key = OFFLINE_API_KEY
+    client = RateLimitedGoogleMapsClient(key=api_key, buckets=get_google_buckets(), requests_session=session)
+    if not has_app_context() or not current_app.config.get('GMAPS_CACHE_ENABLED'):
+        return client
+    return CachedGoogleMapsClient(client, get_gmaps_cache())
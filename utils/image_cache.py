@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+import logging
+from flask import current_app, has_app_context
+from config import Config
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Query parameters that hold credentials; left out of cache keys
+SECRET_PARAMS = {'key', 'signature', 'client'}
+
+class ImageCache:
+    """
+    Downloaded images stored as files in a directory, keyed by request
+    
+    Keys are hashes of the image URL and its query parameters (credentials
+    excluded), so the same map or Street View request is downloaded once
+    and shared by every worker on the host. Reads refresh a file's mtime,
+    and writes evict the least recently used files once the directory
+    holds more than max_bytes.
+    """
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def key_for(url, params):
+        """
+        Cache key for a GET of url with params (a list of (name, value) pairs)
+        
+        Parameter order is kept: repeated parameters such as map markers
+        are drawn in order.
+        """
+        normalized = [(name, str(value)) for name, value in params if name not in SECRET_PARAMS]
+        payload = repr((url, normalized))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.img")
+    
+    def get(self, key):
+        """Cached image bytes for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            # Mark as recently used for eviction
+            os.utime(path)
+            return content
+        except OSError:
+            return None
+    
+    def put(self, key, content):
+        """Store image bytes under key, then evict old images if over the size limit"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache image {key[:12]}: {e}")
+            return
+        self.evict()
+    
+    def evict(self):
+        """Delete least recently used images until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith('.img'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        
+        if total <= self.max_bytes:
+            return
+        
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # Already removed by another worker
+                pass
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_image_cache():
+    """Get the image cache from the app config (the base config outside an app), or None if disabled"""
+    source = current_app.config if has_app_context() else {
+        name: getattr(Config, name) for name in dir(Config) if name.startswith('PDF_IMAGE_CACHE')
+    }
+    if not source.get('PDF_IMAGE_CACHE_ENABLED'):
+        return None
+    
+    directory = source['PDF_IMAGE_CACHE_DIR']
+    cache = _caches.get(directory)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(directory)
+            if cache is None:
+                cache = ImageCache(directory, source['PDF_IMAGE_CACHE_MAX_MB'] * 1024 * 1024)
+                _caches[directory] = cache
+    return cache
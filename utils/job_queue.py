@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+import concurrent.futures
+from config.processing_config import PROCESSING_TIMEOUT_SECONDS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Finished jobs are purged at most this often (seconds), when jobs are submitted
+PURGE_INTERVAL = 3600
+
+# Error recorded for jobs whose worker process went away before they finished
+INTERRUPTED_ERROR = ("The analysis was interrupted because the server process running it stopped. "
+                     "Please upload the file again.")
+
+# Columns added to the jobs table after it was first released, with their definitions
+ADDED_COLUMNS = {
+    'notified': 'INTEGER NOT NULL DEFAULT 0',
+    'pid': 'INTEGER'
+}
+
+def _process_alive(pid):
+    """Whether a process with this pid is running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueue:
+    """
+    Run long analyses on a local worker pool and track their progress
+    
+    Jobs execute on a thread pool inside the web process, so the request that
+    submits a job returns immediately. Job state lives in a SQLite file, which
+    lets any gunicorn worker answer a status poll for a job started by another.
+    Finished jobs are deleted retention_seconds after they end.
+    
+    Each job records the pid of the process whose pool runs it. A queued or
+    running job whose process has exited (a recycled or killed worker), or a
+    running job with no progress for stale_after seconds, is marked failed,
+    so polls end instead of waiting forever.
+    """
+    
+    def __init__(self, db_path, max_workers=2, retention_seconds=24 * 3600,
+                 stale_after=PROCESSING_TIMEOUT_SECONDS):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.stale_after = stale_after
+        self._last_purge = 0.0
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='job-worker'
+        )
+        self._local = threading.local()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    task_id TEXT PRIMARY KEY,
+                    owner TEXT,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL,
+                    notified INTEGER NOT NULL DEFAULT 0,
+                    pid INTEGER
+                )"""
+            )
+            # Job files created before these columns were added
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        
+        # Jobs left behind by worker processes that have since exited
+        self.fail_stale_jobs()
+    
+    def _connection(self):
+        """Get this thread's connection (sqlite3 connections are not thread safe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+    
+    def _update(self, task_id, **fields):
+        """Update columns for a job"""
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        conn = self._connection()
+        with conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE task_id = ?", (*fields.values(), task_id))
+    
+    def submit(self, func, *args, owner=None, **kwargs):
+        """
+        Queue func for background execution
+        
+        func is called as ``func(*args, progress=callback, **kwargs)`` where
+        ``callback(percent, message=None)`` records progress. Its return value
+        must be JSON serialisable and is stored as the job result. Finished
+        jobs past their retention are purged here, and stale jobs failed, at
+        most once per PURGE_INTERVAL.
+        
+        Returns:
+            str: Task id for status lookups
+        """
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """INSERT INTO jobs (task_id, owner, status, progress, message, created_at, updated_at, pid)
+                   VALUES (?, ?, 'queued', 0, 'Queued...', ?, ?, ?)""",
+                (task_id, None if owner is None else str(owner), now, now, os.getpid())
+            )
+        
+        self.executor.submit(self._run, task_id, func, args, kwargs)
+        
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            try:
+                self.fail_stale_jobs()
+                self.purge(self.retention_seconds)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not purge finished jobs: {e}")
+        return task_id
+    
+    def _run(self, task_id, func, args, kwargs):
+        """Execute a job and record its outcome"""
+        self._update(task_id, status='processing', started_at=time.time())
+        
+        def progress(percent, message=None):
+            fields = {'progress': int(percent)}
+            if message:
+                fields['message'] = message
+            try:
+                self._update(task_id, **fields)
+            except Exception as e:
+                logger.warning(f"Could not record progress for job {task_id}: {e}")
+        
+        try:
+            result = func(*args, progress=progress, **kwargs)
+            self._update(task_id, status='complete', progress=100, message='Complete!',
+                         result=json.dumps(result))
+        except Exception as e:
+            logger.error(f"Job {task_id} failed: {str(e)}")
+            self._update(task_id, status='failed', message='Failed', error=str(e))
+    
+    def get_status(self, task_id):
+        """
+        Get the current state of a job
+        
+        Returns:
+            dict: Job fields, or None if the task id is unknown
+        """
+        row = self._connection().execute(
+            "SELECT * FROM jobs WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        
+        if row is None:
+            return None
+        
+        if self._is_stale(row, time.time()) and self._fail_stale(row):
+            return self.get_status(task_id)
+        
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+    
+    def _is_stale(self, row, now):
+        """Whether an unfinished job can no longer finish"""
+        if row['status'] not in ('queued', 'processing'):
+            return False
+        if row['pid'] is None or not _process_alive(row['pid']):
+            return True
+        return row['status'] == 'processing' and now - row['updated_at'] > self.stale_after
+    
+    def _fail_stale(self, row):
+        """Mark a stale job failed, unless it changed since row was read"""
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                """UPDATE jobs SET status = 'failed', message = 'Failed', error = ?, updated_at = ?
+                   WHERE task_id = ? AND status = ? AND updated_at = ?""",
+                (INTERRUPTED_ERROR, time.time(), row['task_id'], row['status'], row['updated_at'])
+            )
+        if cursor.rowcount:
+            logger.warning(f"Job {row['task_id']} was interrupted (pid {row['pid']}), marked failed")
+        return cursor.rowcount > 0
+    
+    def fail_stale_jobs(self):
+        """
+        Mark queued and running jobs that can no longer finish as failed
+        
+        Returns:
+            int: Number of jobs marked failed
+        """
+        rows = self._connection().execute(
+            "SELECT task_id, status, pid, updated_at FROM jobs WHERE status IN ('queued', 'processing')"
+        ).fetchall()
+        now = time.time()
+        return sum(1 for row in rows if self._is_stale(row, now) and self._fail_stale(row))
+    
+    def mark_notified(self, task_id):
+        """
+        Record that the user was told a job finished
+        
+        Returns:
+            bool: True the first time it is called for a job, so a status poll
+            can tell whether it is the first to see the job finished
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET notified = 1 WHERE task_id = ? AND notified = 0", (task_id,)
+            )
+        return cursor.rowcount > 0
+    
+    def purge(self, older_than_seconds=24 * 3600):
+        """Delete finished jobs older than the given age"""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('complete', 'failed') AND updated_at < ?",
+                (time.time() - older_than_seconds,)
+            )
@@ -3,15 +3,51 @@
 
 from fpdf import FPDF
 import os
+import logging
 import datetime
 import matplotlib.pyplot as plt
 import numpy as np
 import io
 import base64
 import requests
-import tempfile
 import json
 import matplotlib.patches as mpatches
+from .rate_limit import get_bucket, get_with_retry, google_bucket_name
+from .image_cache import ImageCache, get_image_cache
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+def fetch_map_image(url, params, api_key):
+    """
+    Download a Google Maps image (Static Maps, Street View)
+    
+    Images are kept in the on-disk image cache, keyed by url and params,
+    so regenerating reports for the same route does not download them
+    again.
+    
+    Args:
+        url: Image endpoint
+        params: List of (name, value) query parameters, without the key
+        api_key: Google Maps API key
+    
+    Returns:
+        bytes: Image content, or None if the request failed
+    """
+    cache = get_image_cache()
+    key = ImageCache.key_for(url, params)
+    if cache:
+        content = cache.get(key)
+        if content is not None:
+            return content
+    
+    response = get_with_retry(url, bucket=get_bucket(google_bucket_name(url)), params=params + [("key", api_key)], timeout=15)
+    if response.status_code != 200:
+        return None
+    
+    if cache:
+        cache.put(key, response.content)
+    return response.content
 
 class RoutePDF(FPDF):
     def __init__(self, title=None):
@@ -249,36 +285,33 @@ class RoutePDF(FPDF):
     def add_street_view_image(self, lat, lng, api_key, heading=0, pitch=0, fov=90):
         """Add Google Street View image with specific viewing angle"""
         try:
-            url = f"https://maps.googleapis.com/maps/api/streetview?size=600x400&location={lat},{lng}&heading={heading}&pitch={pitch}&fov={fov}&key={api_key}"
-            response = requests.get(url, timeout=15)
+            params = [
+                ("size", "600x400"),
+                ("location", f"{float(lat):.6f},{float(lng):.6f}"),
+                ("heading", heading),
+                ("pitch", pitch),
+                ("fov", fov)
+            ]
+            content = fetch_map_image("https://maps.googleapis.com/maps/api/streetview", params, api_key)
             
-            if response.status_code == 200 and len(response.content) > 1000:
-                # Save image to temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp:
-                    temp.write(response.content)
-                    temp_path = temp.name
-                
-                # Add image to PDF
-                self.image(temp_path, x=15, w=180)
-                
-                # Clean up
-                os.unlink(temp_path)
+            # Locations without imagery return a small placeholder
+            if content and len(content) > 1000:
+                self.image(io.BytesIO(content), x=15, w=180)
                 return True
             
             return False
         except Exception as e:
-            print(f"Error adding street view: {e}")
+            logger.warning(f"Error adding street view: {e}")
             return False
 
     def add_static_map_image(self, center_lat, center_lng, markers, api_key, zoom=15, size="640x400"):
         """Add Google Static Maps image with markers"""
         try:
-            base_url = "https://maps.googleapis.com/maps/api/staticmap"
             params = [
-                f"center={center_lat},{center_lng}",
-                f"zoom={zoom}",
-                f"size={size}",
-                "maptype=roadmap"
+                ("center", f"{float(center_lat):.6f},{float(center_lng):.6f}"),
+                ("zoom", zoom),
+                ("size", size),
+                ("maptype", "roadmap")
             ]
             
             # Add markers
@@ -287,25 +320,17 @@ class RoutePDF(FPDF):
                 label = marker.get('label', '')
                 lat = marker.get('lat')
                 lng = marker.get('lng')
-                params.append(f"markers=color:{color}|label:{label}|{lat},{lng}")
+                params.append(("markers", f"color:{color}|label:{label}|{lat},{lng}"))
             
-            params.append(f"key={api_key}")
+            content = fetch_map_image("https://maps.googleapis.com/maps/api/staticmap", params, api_key)
             
-            url = f"{base_url}?" + "&".join(params)
-            response = requests.get(url, timeout=15)
-            
-            if response.status_code == 200:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp:
-                    temp.write(response.content)
-                    temp_path = temp.name
-                
-                self.image(temp_path, x=15, w=180)
-                os.unlink(temp_path)
+            if content:
+                self.image(io.BytesIO(content), x=15, w=180)
                 return True
             
             return False
         except Exception as e:
-            print(f"Error adding static map: {e}")
+            logger.warning(f"Error adding static map: {e}")
             return False
 
     def add_enhanced_blind_spots_section(self, turns, route_polyline=None, api_key=None):
@@ -1141,10 +1166,10 @@ def generate_pdf(filename, from_addr, to_addr, distance, duration, turns, petrol
     # Save the PDF
     try:
         pdf.output(filename)
-        print(f"Enhanced PDF report generated successfully: {filename}")
+        logger.info(f"Enhanced PDF report generated successfully: {filename}")
         return filename
     except Exception as e:
-        print(f"Error generating enhanced PDF: {e}")
+        logger.error(f"Error generating enhanced PDF: {e}")
         return None
 
 # Example usage function
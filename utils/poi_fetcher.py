@@ -0,0 +1,186 @@
+import concurrent.futures
+import math
+import threading
+import time
+import logging
+import googlemaps
+import numpy as np
+from .geo import haversine_m
+from .rate_limit import RateLimitTimeout
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Places requests in flight at once across every fetch in this process, so
+# several concurrent analyses cannot flood the API between them
+MAX_CONCURRENT_REQUESTS = 8
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Largest radius the Places nearby search accepts
+MAX_SEARCH_RADIUS_M = 50000
+
+# A nearby search returns 20 results per page, and at most 3 pages
+PAGE_SIZE = 20
+MAX_PAGES = 3
+
+# A next_page_token becomes valid a couple of seconds after it is issued
+PAGE_TOKEN_DELAY = 2
+PAGE_TOKEN_ATTEMPTS = 3
+
+def plan_search_centers(route_index, corridor_width_m=2000, max_radius_m=5000):
+    """
+    Search circles along the route for places within corridor_width_m of it
+    
+    On a straight road, circles of radius r centred every s meters cover a
+    band of half-width w when r^2 >= w^2 + (s/2)^2, so with the radius
+    capped at max_radius_m the circles can be up to 2*sqrt(max_radius_m^2 -
+    w^2) apart. Centers are spread evenly by chainage at that spacing, and
+    each circle's radius is then fitted to the farthest route point in its
+    stretch: where the road winds, its stretch stays close to the center
+    and the circle shrinks.
+    
+    Coverage is exact only for straight stretches. At bends the outer edge
+    of the corridor can fall between neighbouring circles, so a small part
+    of it (about 2% on winding routes) is not searched.
+    
+    Args:
+        route_index (RouteIndex): Index over the route polyline
+        corridor_width_m (float): Distance either side of the route to cover
+        max_radius_m (float): Largest search radius to use
+    
+    Returns:
+        tuple: ((N, 2) array of [lat, lng] centers, list of N radii in meters)
+    
+    Raises:
+        ValueError: If max_radius_m does not exceed corridor_width_m
+    """
+    if max_radius_m <= corridor_width_m:
+        raise ValueError("max_radius_m must be larger than corridor_width_m")
+    if len(route_index) == 0:
+        return np.zeros((0, 2)), []
+    if route_index.length_m == 0:
+        return route_index.points[:1].copy(), [int(math.ceil(corridor_width_m))]
+    
+    spacing = 2 * math.sqrt(max_radius_m ** 2 - corridor_width_m ** 2)
+    count = max(1, math.ceil(route_index.length_m / spacing))
+    stretch = route_index.length_m / count
+    chainages = (np.arange(count) + 0.5) * stretch
+    centers = route_index.point_at(chainages)
+    
+    radii = []
+    for center, chainage in zip(centers, chainages):
+        # Distance to a polyline peaks at a vertex or an end of the stretch
+        points = route_index.slice(chainage - stretch / 2, chainage + stretch / 2)
+        reach = float(haversine_m(center[0], center[1], points[:, 0], points[:, 1]).max())
+        radius = math.sqrt(corridor_width_m ** 2 + reach ** 2)
+        radii.append(int(math.ceil(min(radius, max_radius_m, MAX_SEARCH_RADIUS_M))))
+    
+    return centers, radii
+
+def _next_page(gmaps, page_token):
+    """The page behind page_token, or None if the token never became valid"""
+    for _ in range(PAGE_TOKEN_ATTEMPTS):
+        time.sleep(PAGE_TOKEN_DELAY)
+        try:
+            with _request_slots:
+                return gmaps.places_nearby(page_token=page_token)
+        except googlemaps.exceptions.ApiError as e:
+            # Returned while the token is not valid yet
+            if e.status != 'INVALID_REQUEST':
+                raise
+    logger.warning("Places page token did not become valid, keeping the earlier pages")
+    return None
+
+def _search(gmaps, point, place_type, radius, follow_pages=True):
+    """
+    Results of one nearby search
+    
+    Results are ranked by prominence, so a full page means less prominent
+    places were cut off. With follow_pages, a full page's next_page_token
+    is followed for up to MAX_PAGES pages.
+    """
+    with _request_slots:
+        response = gmaps.places_nearby(location=(point[0], point[1]), radius=radius, type=place_type)
+    results = list(response.get('results', []))
+    
+    pages = 1
+    while follow_pages and pages < MAX_PAGES and len(response.get('results', [])) >= PAGE_SIZE:
+        page_token = response.get('next_page_token')
+        if not page_token:
+            break
+        response = _next_page(gmaps, page_token)
+        if response is None:
+            break
+        results.extend(response.get('results', []))
+        pages += 1
+    
+    return results
+
+def fetch_pois(gmaps, points, categories, radius=1000, max_results=None, max_workers=MAX_CONCURRENT_REQUESTS,
+               radii=None):
+    """
+    Search for places of several types around several points concurrently
+    
+    One nearby search is made per (point, category) pair, on a thread
+    pool; full pages are followed to the next page unless max_results fits
+    in one page. Results are merged per category in point order and
+    deduplicated by place_id (or name when there is none), so overlapping
+    searches return each place once. Places without a name or geometry are
+    dropped, and each kept place gets a 'latlng' entry with its location.
+    A failed request is logged and skipped, but a RateLimitTimeout is
+    raised: a search that never ran is not an empty one.
+    
+    Args:
+        gmaps: Google Maps client instance
+        points: Search centers as [lat, lng]
+        categories (dict): Result key -> Places API type
+        radius (int): Search radius in meters
+        max_results (int): Keep at most this many results per request
+        max_workers (int): Threads for this fetch; requests across all
+            fetches are also capped by MAX_CONCURRENT_REQUESTS
+        radii: Search radius per point, in place of radius (for example
+            from plan_search_centers)
+    
+    Returns:
+        dict: Result key -> list of place dicts
+    
+    Raises:
+        RateLimitTimeout: If the Places API had no capacity for a request
+    """
+    if radii is None:
+        radii = [radius] * len(points)
+    tasks = [(point, point_radius, key, place_type)
+             for point, point_radius in zip(points, radii) for key, place_type in categories.items()]
+    places = {key: [] for key in categories}
+    if not tasks:
+        return places
+    
+    follow_pages = max_results is None or max_results > PAGE_SIZE
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as executor:
+        futures = [executor.submit(_search, gmaps, point, place_type, point_radius, follow_pages)
+                   for point, point_radius, _, place_type in tasks]
+        
+        seen = {key: set() for key in categories}
+        # Merge in submission order so results do not depend on timing
+        for (point, _, key, place_type), future in zip(tasks, futures):
+            try:
+                results = future.result()
+            except RateLimitTimeout:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            except Exception as e:
+                logger.warning(f"POI search error for {place_type} at ({point[0]}, {point[1]}): {e}")
+                continue
+            
+            for place in results[:max_results]:
+                if 'geometry' not in place or 'name' not in place:
+                    continue
+                place_id = place.get('place_id') or place['name']
+                if place_id in seen[key]:
+                    continue
+                seen[key].add(place_id)
+                place['latlng'] = place['geometry']['location']
+                places[key].append(place)
+    
+    return places
@@ -0,0 +1,281 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+import urllib.parse
+import googlemaps
+import requests
+from flask import current_app, has_app_context
+from config.processing_config import MAX_API_CALLS_PER_MINUTE, API_RATE_LIMITS, API_RETRY_ATTEMPTS, API_RETRY_DELAY
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Longest single backoff sleep (seconds)
+MAX_RETRY_DELAY = 30
+
+# Longest a caller waits for a token before giving up (seconds)
+MAX_TOKEN_WAIT = 120
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Google API statuses that mean "try again later" rather than "bad request"
+RETRY_API_STATUSES = {'OVER_QUERY_LIMIT', 'RESOURCE_EXHAUSTED', 'UNKNOWN_ERROR'}
+
+# Token bucket for each Google Maps web service, by request path prefix
+GOOGLE_API_BUCKETS = {
+    '/maps/api/directions/': 'directions',
+    '/maps/api/elevation/': 'elevation',
+    '/maps/api/geocode/': 'geocode',
+    '/maps/api/place/': 'places',
+    '/maps/api/staticmap': 'static_maps',
+    '/maps/api/streetview': 'street_view'
+}
+
+# Shown to users when an analysis stops because an API had no capacity left
+API_BUSY_MESSAGE = "Map and weather services are busy right now, please try again in a few minutes."
+
+class RateLimitTimeout(Exception):
+    """Raised when no token became available within the allowed wait"""
+
+class RetryableStatus(Exception):
+    """An HTTP response with a status listed in RETRY_STATUSES"""
+    
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+class TokenBucket:
+    """
+    Token bucket limiting calls to one API
+    
+    The bucket holds up to ``capacity`` tokens and refills at
+    ``rate_per_minute``; each call takes one token and waits when none are
+    left. With a ``path`` the bucket state lives in a SQLite file, so every
+    gunicorn worker on the host draws from the same bucket; without one it
+    is local to this process.
+    """
+    
+    def __init__(self, name, rate_per_minute=MAX_API_CALLS_PER_MINUTE, capacity=None, path=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or rate_per_minute)
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = self._connection()
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS token_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+    
+    def _connection(self):
+        """Get this thread's connection (autocommit, transactions are explicit)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+    
+    def _take(self, tokens, now):
+        """Take tokens if available; returns the seconds to wait otherwise (0 on success)"""
+        if not self.path:
+            with self._lock:
+                available = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if available >= tokens:
+                    self._tokens = available - tokens
+                    return 0.0
+                self._tokens = available
+                return (tokens - available) / self.rate
+        
+        conn = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so the
+        # read-refill-write below is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            if row is None:
+                available = self.capacity
+            else:
+                available = min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.name, available, now)
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def acquire(self, tokens=1, max_wait=MAX_TOKEN_WAIT):
+        """
+        Take tokens from the bucket, sleeping until they are available
+        
+        Raises:
+            RateLimitTimeout: If the tokens are not available within max_wait seconds
+        """
+        deadline = time.time() + max_wait
+        while True:
+            now = time.time()
+            try:
+                wait = self._take(tokens, now)
+            except sqlite3.Error as e:
+                # A broken bucket file must not stop API calls altogether
+                logger.warning(f"Rate limiter '{self.name}' unavailable, not limiting: {e}")
+                return
+            
+            if wait <= 0:
+                return
+            if now + wait > deadline:
+                raise RateLimitTimeout(f"No '{self.name}' API capacity within {max_wait}s")
+            # Small jitter so waiting threads do not all wake at once
+            time.sleep(wait + random.uniform(0, 0.1))
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(name):
+    """
+    Get the token bucket for an API (a key of API_RATE_LIMITS, e.g. 'places')
+    
+    Inside an app context the bucket is shared across workers through
+    API_RATE_LIMIT_PATH and limited to the API's API_CALLS_PER_MINUTE
+    entry; otherwise it is local to this process and uses the processing
+    config defaults.
+    """
+    path = None
+    limits = API_RATE_LIMITS
+    if has_app_context():
+        path = current_app.config.get('API_RATE_LIMIT_PATH')
+        limits = current_app.config.get('API_CALLS_PER_MINUTE', limits)
+    rate = limits.get(name, MAX_API_CALLS_PER_MINUTE)
+    
+    key = (name, path, rate)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(name, rate_per_minute=rate, path=path)
+                _buckets[key] = bucket
+    return bucket
+
+def google_bucket_name(url):
+    """Bucket name for a Google Maps web service URL or path, or None if it is not listed"""
+    path = urllib.parse.urlparse(url).path
+    for prefix, name in GOOGLE_API_BUCKETS.items():
+        if path.startswith(prefix):
+            return name
+    return None
+
+def get_google_buckets():
+    """Token buckets for every Google Maps web service, by bucket name"""
+    return {name: get_bucket(name) for name in GOOGLE_API_BUCKETS.values()}
+
+def is_retryable(error):
+    """Whether an API error is transient (throttling, timeouts, server errors)"""
+    # googlemaps HTTPError is a TransportError, so it is checked first
+    if isinstance(error, googlemaps.exceptions.HTTPError):
+        return error.status_code in RETRY_STATUSES
+    if isinstance(error, (RetryableStatus, googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError)):
+        return True
+    if isinstance(error, googlemaps.exceptions.ApiError):
+        return error.status in RETRY_API_STATUSES
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRY_STATUSES
+    return False
+
+def backoff_delay(attempt, base_delay=API_RETRY_DELAY, max_delay=MAX_RETRY_DELAY):
+    """Sleep before retry number attempt (0-based): full jitter over an exponential window"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def call_with_retry(func, *args, bucket=None, attempts=API_RETRY_ATTEMPTS, base_delay=API_RETRY_DELAY, **kwargs):
+    """
+    Call func through the rate limiter, retrying transient failures
+    
+    Every attempt takes a token from bucket first. Errors accepted by
+    is_retryable() are retried up to attempts more times with jittered
+    exponential backoff; other errors, and the last failure, are raised.
+    """
+    for attempt in range(attempts + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= attempts or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            logger.info(f"Retrying {getattr(func, '__name__', 'API call')} in {delay:.1f}s after: {e}")
+            time.sleep(delay)
+
+def get_with_retry(url, bucket=None, session=None, **kwargs):
+    """
+    HTTP GET through the rate limiter, retrying throttled and failed requests
+    
+    Responses with a status in RETRY_STATUSES are retried; if they keep
+    coming, the last one is returned so the caller can inspect it.
+    """
+    getter = session.get if session is not None else requests.get
+    
+    def get():
+        response = getter(url, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableStatus(response)
+        return response
+    
+    try:
+        return call_with_retry(get, bucket=bucket)
+    except RetryableStatus as e:
+        return e.response
+
+class RateLimitedGoogleMapsClient(googlemaps.Client):
+    """
+    googlemaps.Client whose requests go through per-API token buckets
+    
+    buckets maps the names in GOOGLE_API_BUCKETS to token buckets, so each
+    web service is held to its own quota. The client's own retry loop is
+    replaced by call_with_retry(), so quota and server errors back off
+    under the shared policy instead of being retried independently by each
+    client for up to a minute.
+    """
+    
+    def __init__(self, *args, buckets=None, **kwargs):
+        kwargs.setdefault('retry_over_query_limit', False)
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets or {}
+    
+    def _request(self, url, params, first_request_time=None, retry_counter=0, *args, **kwargs):
+        if retry_counter > 0:
+            # googlemaps retries retriable HTTP statuses by recursing here
+            raise googlemaps.exceptions.TransportError(f"Retriable HTTP status from {url}")
+        
+        return call_with_retry(
+            super()._request, url, params, first_request_time, retry_counter, *args,
+            bucket=self.buckets.get(google_bucket_name(url)), **kwargs
+        )
@@ -1,87 +1,55 @@
 import math
-from geopy.distance import geodesic
 import numpy as np
 import logging
+from .route_index import RouteIndex
 
 logger = logging.getLogger(__name__)
 
-def split_route_into_segments(polyline, segment_length_meters=5000):
-    """Split a route into roughly equal segments of specified length"""
-    segments = []
-    current_segment = []
-    current_length = 0
+def split_route_into_segments(polyline, segment_length_meters=5000, route_index=None):
+    """
+    Split a route into consecutive segments of at most segment_length_meters
     
-    for i in range(len(polyline) - 1):
-        point1 = (polyline[i][0], polyline[i][1])
-        point2 = (polyline[i+1][0], polyline[i+1][1])
-        
-        # Calculate distance between consecutive points
-        try:
-            distance = geodesic(point1, point2).meters
-        except:
-            distance = 100  # Default value if calculation fails
-        
-        if current_length + distance > segment_length_meters and len(current_segment) > 0:
-            # End of segment reached
-            current_segment.append(polyline[i])
-            segments.append({
-                'points': current_segment.copy(),  # Make sure to copy the list
-                'start_point': current_segment[0],
-                'end_point': current_segment[-1],
-                'distance': current_length
-            })
-            current_segment = [polyline[i]]
-            current_length = 0
-        else:
-            current_segment.append(polyline[i])
-            current_length += distance
+    Segments share their boundary point. Each carries its length and its
+    start/end chainage (distance from the route start) in meters.
+    """
+    index = route_index or RouteIndex(polyline)
+    segments = []
     
-    # Add the last segment if it has points
-    if current_segment:
-        # Make sure to add the last point from the polyline to close the segment
-        if polyline and i+1 < len(polyline):
-            current_segment.append(polyline[-1])
-        
+    for start, end in index.split(segment_length_meters):
+        points = list(polyline[start:end + 1])
         segments.append({
-            'points': current_segment,
-            'start_point': current_segment[0],
-            'end_point': current_segment[-1],
-            'distance': current_length
+            'points': points,
+            'start_point': points[0],
+            'end_point': points[-1],
+            'distance': float(index.cumulative[end] - index.cumulative[start]),
+            'start_distance': float(index.cumulative[start]),
+            'end_distance': float(index.cumulative[end])
         })
     
     return segments
 
-def point_in_segment(point, segment):
-    """Check if a point is within a route segment"""
-    point_coords = (point['lat'], point['lng'])
+def assign_to_segments(route_index, segments, points, max_distance_m):
+    """
+    Match points to the route segments they lie near, in one vectorized pass
     
-    for seg_point in segment['points']:
-        seg_coords = (seg_point[0], seg_point[1])
-        if geodesic(point_coords, seg_coords).meters < 100:  # Within 100m
-            return True
-    return False
-
-def calculate_elevation_change(elevation_data, segment):
-    """Calculate elevation change within a segment"""
-    if not elevation_data:
-        return 0
-        
-    segment_elevations = []
+    Every point is projected onto the route once (chainage and offset). Its
+    distance to a segment is then the offset combined with how far the
+    chainage falls outside the segment's [start_distance, end_distance]
+    range, so no per-point, per-vertex distance calls are needed.
     
-    # Find elevation points within the segment
-    for elev in elevation_data:
-        elev_point = (elev['location']['lat'], elev['location']['lng'])
-        for seg_point in segment['points']:
-            seg_coords = (seg_point[0], seg_point[1])
-            if geodesic(elev_point, seg_coords).meters < 100:  # Within 100m
-                segment_elevations.append(elev['elevation'])
-                break
+    Returns:
+        ndarray: bool (points, segments), True where the point is within
+        max_distance_m of the segment
+    """
+    if len(points) == 0 or not segments:
+        return np.zeros((len(points), len(segments)), dtype=bool)
     
-    if not segment_elevations:
-        return 0
-        
-    # Calculate max elevation change
-    return max(segment_elevations) - min(segment_elevations)
+    chainage, offset, _ = route_index.locate(points)
+    starts = np.array([segment['start_distance'] for segment in segments])
+    ends = np.array([segment['end_distance'] for segment in segments])
+    
+    gap = np.maximum(np.maximum(starts[None, :] - chainage[:, None], chainage[:, None] - ends[None, :]), 0)
+    return np.hypot(gap, offset[:, None]) < max_distance_m
 
 def is_adverse_weather(weather):
     """Determine if weather conditions are adverse"""
@@ -107,21 +75,6 @@ def is_adverse_weather(weather):
             
     return False
 
-def get_segment_weather(weather_data, segment):
-    """Get weather data for a segment"""
-    if not weather_data:
-        return None
-        
-    # Find weather points within the segment
-    for weather in weather_data:
-        weather_point = (weather['lat'], weather['lng'])
-        for seg_point in segment['points']:
-            seg_coords = (seg_point[0], seg_point[1])
-            if geodesic(weather_point, seg_coords).meters < 5000:  # Within 5km
-                return weather
-                
-    return None
-
 def get_road_quality(gmaps, segment, api_key):
     """Attempt to estimate road quality using Google Maps data"""
     try:
@@ -200,7 +153,8 @@ def calculate_route_risk(route_data, turns, elevation_data, weather_data, gmaps,
     
     # Try to split the route into segments
     try:
-        route_segments = split_route_into_segments(route_data, 5000)  # 5km segments
+        route_index = RouteIndex(route_data)
+        route_segments = split_route_into_segments(route_data, 5000, route_index)  # 5km segments
     except Exception as e:
         logger.error(f"Error splitting route: {e}")
         # Return a default segment if splitting fails
@@ -217,8 +171,29 @@ def calculate_route_risk(route_data, turns, elevation_data, weather_data, gmaps,
         }
         return [default_segment]
     
+    # Match turns (within 100m), elevation samples (within 100m) and weather
+    # samples (within 5km) to segments, all at once
+    try:
+        turns = turns or []
+        elevation_data = elevation_data or []
+        weather_data = weather_data or []
+        turn_near = assign_to_segments(
+            route_index, route_segments, [(t['lat'], t['lng']) for t in turns], 100
+        )
+        elevation_near = assign_to_segments(
+            route_index, route_segments,
+            [(e['location']['lat'], e['location']['lng']) for e in elevation_data], 100
+        )
+        weather_near = assign_to_segments(
+            route_index, route_segments, [(w['lat'], w['lng']) for w in weather_data], 5000
+        )
+    except Exception as e:
+        logger.error(f"Error matching samples to segments: {e}")
+        turns, elevation_data, weather_data = [], [], []
+        turn_near = elevation_near = weather_near = np.zeros((0, len(route_segments)), dtype=bool)
+    
     # Process each segment
-    for segment in route_segments:
+    for k, segment in enumerate(route_segments):
         segment_risk = {
             'start_point': segment['start_point'],
             'end_point': segment['end_point'],
@@ -230,7 +205,7 @@ def calculate_route_risk(route_data, turns, elevation_data, weather_data, gmaps,
         
         # Check for sharp turns in segment
         try:
-            segment_turns = [t for t in turns if point_in_segment(t, segment)]
+            segment_turns = [t for t, near in zip(turns, turn_near[:, k]) if near]
             if len(segment_turns) > 0:
                 segment_risk['risk_factors'].append({
                     'type': 'sharp_turns',
@@ -244,7 +219,8 @@ def calculate_route_risk(route_data, turns, elevation_data, weather_data, gmaps,
         
         # Check for elevation changes
         try:
-            elevation_change = calculate_elevation_change(elevation_data, segment)
+            segment_elevations = [e['elevation'] for e, near in zip(elevation_data, elevation_near[:, k]) if near]
+            elevation_change = max(segment_elevations) - min(segment_elevations) if segment_elevations else 0
             if elevation_change > 100:  # More than 100m change
                 segment_risk['risk_factors'].append({
                     'type': 'elevation',
@@ -257,7 +233,7 @@ def calculate_route_risk(route_data, turns, elevation_data, weather_data, gmaps,
             
         # Check for adverse weather
         try:
-            segment_weather = get_segment_weather(weather_data, segment)
+            segment_weather = next((w for w, near in zip(weather_data, weather_near[:, k]) if near), None)
             if segment_weather and is_adverse_weather(segment_weather):
                 segment_risk['risk_factors'].append({
                     'type': 'weather',
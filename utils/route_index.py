@@ -0,0 +1,255 @@
+import numpy as np
+import logging
+from .geo import as_points, cumulative_distance_m, project_to_plane
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+class RouteIndex:
+    """
+    Chainage index over a route polyline
+    
+    Holds the distance along the route (chainage) at every vertex and, when
+    the route duration is known, an ETA per vertex. Lookups from distance
+    or time to a position are binary searches on these arrays, and
+    locate() projects arbitrary points onto the route, so analyses can ask
+    "how far along the route is this?" without re-walking the polyline.
+    """
+    
+    def __init__(self, points, duration_seconds=None, ellipsoidal=False):
+        self.points = as_points(points)
+        self.cumulative = cumulative_distance_m(self.points, ellipsoidal)
+        self.length_m = float(self.cumulative[-1]) if len(self.cumulative) else 0.0
+        
+        # ETA assumes an even pace over the route's total duration
+        self.duration_seconds = duration_seconds
+        if duration_seconds and self.length_m > 0:
+            self.eta = self.cumulative / self.length_m * duration_seconds
+        else:
+            self.eta = None
+        
+        self._xy = None
+    
+    def __len__(self):
+        return len(self.points)
+    
+    def projected(self):
+        """Vertices in the local metric plane (meters), computed once"""
+        if self._xy is None:
+            self._xy = project_to_plane(self.points)
+        return self._xy
+    
+    def vertex_at(self, distance_m):
+        """Index of the vertex that starts the leg containing distance_m (arrays accepted)"""
+        index = np.searchsorted(self.cumulative, distance_m, side='right') - 1
+        return np.clip(index, 0, max(len(self.points) - 2, 0))
+    
+    def nearest_vertex(self, distance_m):
+        """Index of the vertex closest along the route to distance_m (arrays accepted)"""
+        after = np.clip(np.searchsorted(self.cumulative, distance_m), 1, max(len(self.points) - 1, 1))
+        before = after - 1
+        if len(self.points) < 2:
+            return np.zeros_like(after)
+        return np.where(np.abs(distance_m - self.cumulative[before]) <=
+                        np.abs(self.cumulative[after] - distance_m), before, after)
+    
+    def point_at(self, distance_m):
+        """
+        Position at distance_m along the route, interpolated within its leg
+        
+        Returns:
+            ndarray: [lat, lng], or an (N, 2) array for an array of distances
+        """
+        distance_m = np.clip(distance_m, 0, self.length_m)
+        return np.stack((np.interp(distance_m, self.cumulative, self.points[:, 0]),
+                         np.interp(distance_m, self.cumulative, self.points[:, 1])), axis=-1)
+    
+    def time_at(self, distance_m):
+        """ETA in seconds at distance_m along the route, or None without a duration"""
+        if self.eta is None:
+            return None
+        return np.interp(distance_m, self.cumulative, self.eta)
+    
+    def distance_at_time(self, seconds):
+        """Distance in meters covered after driving for seconds, or None without a duration"""
+        if self.eta is None:
+            return None
+        return np.interp(seconds, self.eta, self.cumulative)
+    
+    def locate(self, points, max_block_cells=1000000):
+        """
+        Project points onto the route
+        
+        Each point is projected onto the closest leg of the polyline (in a
+        local metric plane), giving its chainage and how far it lies off
+        the route.
+        
+        Returns:
+            tuple: (chainage_m, offset_m, leg_index) arrays, one entry per point
+        """
+        points = as_points(points)
+        if len(points) == 0 or len(self.points) == 0:
+            empty = np.zeros(len(points))
+            return empty, np.full(len(points), np.inf), empty.astype(int)
+        
+        xy = self.projected()
+        origin_lat = float(self.points[:, 0].mean())
+        query = project_to_plane(points, origin_lat)
+        
+        if len(self.points) == 1:
+            offset = np.hypot(*(query - xy[0]).T)
+            return np.zeros(len(points)), offset, np.zeros(len(points), dtype=int)
+        
+        starts = xy[:-1]
+        legs = xy[1:] - starts
+        leg_sq = np.einsum('ij,ij->i', legs, legs)
+        safe_sq = np.where(leg_sq == 0, 1.0, leg_sq)
+        
+        chainage = np.empty(len(points))
+        offset = np.empty(len(points))
+        leg_index = np.empty(len(points), dtype=int)
+        
+        # Bound the (points x legs) working arrays for long routes
+        block_size = max(1, max_block_cells // len(legs))
+        for start in range(0, len(points), block_size):
+            block = query[start:start + block_size]
+            rel = block[:, None, :] - starts[None, :, :]
+            t = np.clip(np.einsum('qlj,lj->ql', rel, legs) / safe_sq, 0.0, 1.0)
+            gap = rel - t[..., None] * legs[None, :, :]
+            dist = np.hypot(gap[..., 0], gap[..., 1])
+            
+            best = np.argmin(dist, axis=1)
+            rows = np.arange(len(block))
+            best_t = t[rows, best]
+            leg_length = self.cumulative[best + 1] - self.cumulative[best]
+            
+            chainage[start:start + block_size] = self.cumulative[best] + best_t * leg_length
+            offset[start:start + block_size] = dist[rows, best]
+            leg_index[start:start + block_size] = best
+        
+        return chainage, offset, leg_index
+    
+    def slice(self, start_m, end_m):
+        """Points of the route between two chainages, with interpolated end points"""
+        start_m, end_m = sorted((float(np.clip(start_m, 0, self.length_m)),
+                                 float(np.clip(end_m, 0, self.length_m))))
+        inner = (self.cumulative > start_m) & (self.cumulative < end_m)
+        return np.vstack((self.point_at(start_m), self.points[inner], self.point_at(end_m)))
+    
+    def split(self, segment_length_m):
+        """
+        Split the route into consecutive pieces of at most segment_length_m
+        
+        Pieces break at vertices: each ends at the last vertex within
+        segment_length_m of its start (or the next vertex, for legs longer
+        than that), and the next piece starts there.
+        
+        Returns:
+            list: (start_vertex, end_vertex) index pairs covering the route
+        """
+        n = len(self.points)
+        if n < 2:
+            return []
+        
+        ranges = []
+        start = 0
+        while start < n - 1:
+            end = int(np.searchsorted(self.cumulative, self.cumulative[start] + segment_length_m,
+                                      side='right')) - 1
+            end = min(max(end, start + 1), n - 1)
+            ranges.append((start, end))
+            start = end
+        
+        return ranges
+
+class RouteProximityIndex:
+    """
+    Grid hash over the legs of a route for "is this point near the route" queries
+    
+    Legs are bucketed into square cells of max_distance_m in the local
+    metric plane. Each leg is cut into pieces no longer than
+    max_distance_m and added to the cells each piece's bounding box (grown
+    by max_distance_m) touches, so a leg lands in a band of cells along it
+    rather than in every cell of its own bounding box. A point can only be
+    within max_distance_m of the legs in its own cell, so a query projects
+    onto a handful of legs instead of the whole polyline.
+    """
+    
+    def __init__(self, route_index, max_distance_m):
+        self.route_index = route_index
+        self.max_distance_m = float(max_distance_m)
+        self.cells = {}
+        
+        points = route_index.points
+        if len(points) < 2 or self.max_distance_m <= 0:
+            return
+        
+        xy = route_index.projected()
+        self._origin_lat = float(points[:, 0].mean())
+        self._starts = xy[:-1]
+        self._legs = xy[1:] - self._starts
+        self._leg_sq = np.einsum('ij,ij->i', self._legs, self._legs)
+        
+        # Pieces of at most one cell in length, each tagged with its leg
+        cell = self.max_distance_m
+        pieces = np.maximum(1, np.ceil(np.sqrt(self._leg_sq) / cell)).astype(int)
+        leg_ids = np.repeat(np.arange(len(pieces)), pieces)
+        step = np.arange(len(leg_ids)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        fraction = (step / pieces[leg_ids])[:, None]
+        piece = self._legs[leg_ids] / pieces[leg_ids][:, None]
+        piece_start = self._starts[leg_ids] + fraction * self._legs[leg_ids]
+        piece_end = piece_start + piece
+        
+        # A grown piece box spans at most 3 cells, so 4 x 4 candidates cover it
+        low = np.floor((np.minimum(piece_start, piece_end) - cell) / cell).astype(int)
+        high = np.floor((np.maximum(piece_start, piece_end) + cell) / cell).astype(int)
+        span = np.arange(4)
+        cx = np.broadcast_to(low[:, 0, None, None] + span[None, :, None], (len(low), 4, 4))
+        cy = np.broadcast_to(low[:, 1, None, None] + span[None, None, :], (len(low), 4, 4))
+        valid = (cx <= high[:, 0, None, None]) & (cy <= high[:, 1, None, None])
+        entries = np.unique(np.column_stack((
+            cx[valid], cy[valid], np.broadcast_to(leg_ids[:, None, None], valid.shape)[valid]
+        )), axis=0)
+        
+        # Rows are sorted by cell, so each cell's legs are one run
+        breaks = np.flatnonzero(np.any(np.diff(entries[:, :2], axis=0) != 0, axis=1)) + 1
+        for group in np.split(entries, breaks):
+            self.cells[(int(group[0, 0]), int(group[0, 1]))] = group[:, 2]
+    
+    def query(self, points):
+        """
+        Find which points lie within max_distance_m of the route
+        
+        Returns:
+            tuple: (near mask, chainage_m, offset_m) arrays, one entry per
+            point; chainage is NaN and offset inf for points not near the route
+        """
+        points = as_points(points)
+        near = np.zeros(len(points), dtype=bool)
+        chainage = np.full(len(points), np.nan)
+        offset = np.full(len(points), np.inf)
+        if not self.cells or len(points) == 0:
+            return near, chainage, offset
+        
+        query = project_to_plane(points, self._origin_lat)
+        keys = np.floor(query / self.max_distance_m).astype(int)
+        cumulative = self.route_index.cumulative
+        for i, (xy, key) in enumerate(zip(query, keys)):
+            legs = self.cells.get((key[0], key[1]))
+            if legs is None:
+                continue
+            
+            rel = xy - self._starts[legs]
+            leg_sq = self._leg_sq[legs]
+            t = np.clip(np.einsum('ij,ij->i', rel, self._legs[legs]) / np.where(leg_sq == 0, 1.0, leg_sq), 0.0, 1.0)
+            gap = rel - t[:, None] * self._legs[legs]
+            dist = np.hypot(gap[:, 0], gap[:, 1])
+            
+            best = int(np.argmin(dist))
+            if dist[best] <= self.max_distance_m:
+                leg = legs[best]
+                near[i] = True
+                offset[i] = dist[best]
+                chainage[i] = cumulative[leg] + t[best] * (cumulative[leg + 1] - cumulative[leg])
+        
+        return near, chainage, offset
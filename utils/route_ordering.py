@@ -0,0 +1,120 @@
+import numpy as np
+import logging
+from scipy.spatial import cKDTree
+from .geo import as_points, distance_m, project_to_plane
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+ORDERING_MODES = ('auto', 'nearest', 'sequential')
+
+def nearest_neighbour_order(points, start_index=0):
+    """
+    Greedy nearest-neighbour chain through points, starting at start_index
+    
+    Points are indexed in a KD-tree on projected coordinates. Each step asks
+    the tree for the closest few points and takes the nearest one not yet
+    visited, widening the query only when all of those are taken. The tree
+    is rebuilt over the remaining points once half of them are visited, so
+    the search stays around O(n log n) overall.
+    
+    Returns:
+        list: Indices into points in visiting order
+    """
+    points = as_points(points)
+    xy = project_to_plane(points)
+    n = len(xy)
+    if n == 0:
+        return []
+    
+    visited = np.zeros(n, dtype=bool)
+    visited[start_index] = True
+    order = [start_index]
+    current = start_index
+    
+    candidates = np.flatnonzero(~visited)
+    tree = cKDTree(xy[candidates]) if len(candidates) else None
+    taken_in_tree = 0
+    
+    while len(order) < n:
+        # Rebuild over the unvisited points when the tree is mostly used up
+        if taken_in_tree * 2 > len(candidates):
+            candidates = np.flatnonzero(~visited)
+            tree = cKDTree(xy[candidates])
+            taken_in_tree = 0
+        
+        k = min(8, len(candidates))
+        nearest = None
+        while nearest is None:
+            _, hits = tree.query(xy[current], k=k)
+            hits = candidates[np.atleast_1d(hits)]
+            free = hits[~visited[hits]]
+            if len(free):
+                # Rank the free hits by true distance; the projection is only
+                # used to find them
+                nearest = int(free[np.argmin(distance_m(points[current], points[free]))])
+            else:
+                k = min(k * 2, len(candidates))
+        
+        visited[nearest] = True
+        order.append(nearest)
+        taken_in_tree += 1
+        current = nearest
+    
+    return order
+
+def is_sequential_trace(points, jump_factor=10, max_jump_ratio=0.01):
+    """
+    Check whether points are already in travel order (e.g. a GPS log)
+    
+    A trace is sequential when consecutive points are about as close as
+    each point's nearest neighbour: legs longer than jump_factor times the
+    median neighbour spacing count as jumps, and at most max_jump_ratio of
+    the legs may be jumps.
+    """
+    xy = project_to_plane(points)
+    if len(xy) < 3:
+        return True
+    
+    legs = np.hypot(*np.diff(xy, axis=0).T)
+    spacing, _ = cKDTree(xy).query(xy, k=2)
+    threshold = max(jump_factor * float(np.median(spacing[:, 1])), 1.0)
+    
+    jumps = int((legs > threshold).sum())
+    return jumps <= max(1, int(max_jump_ratio * len(legs)))
+
+def order_points(points, start, mode='auto'):
+    """
+    Order route points into a path that begins nearest to start
+    
+    Args:
+        points: (N, 2) array or list of [lat, lng]
+        start (tuple): (lat, lng) the route should begin from
+        mode (str): 'nearest' builds a greedy nearest-neighbour chain from the
+            point closest to start; 'sequential' keeps the input order,
+            reversed if its last point is closer to start than its first;
+            'auto' uses 'sequential' when the input already looks like a
+            trace in travel order and 'nearest' otherwise
+    
+    Returns:
+        list: Indices into points in route order
+    """
+    points = as_points(points)
+    if len(points) == 0:
+        return []
+    
+    if mode not in ORDERING_MODES:
+        logger.warning(f"Unknown ordering mode '{mode}', using 'auto'")
+        mode = 'auto'
+    
+    if mode == 'auto':
+        mode = 'sequential' if is_sequential_trace(points) else 'nearest'
+        logger.info(f"Route ordering: using '{mode}' mode")
+    
+    if mode == 'sequential':
+        order = list(range(len(points)))
+        ends = distance_m(start, points[[0, -1]])
+        return order[::-1] if ends[1] < ends[0] else order
+    
+    start_index = int(np.argmin(distance_m(start, points)))
+    return nearest_neighbour_order(points, start_index)
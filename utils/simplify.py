@@ -0,0 +1,105 @@
+import heapq
+import numpy as np
+import logging
+from .geo import project_to_plane
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+def _segment_deviation(xy, start, end):
+    """
+    Distance in meters from each interior point of xy[start:end + 1] to the
+    segment xy[start] - xy[end]
+    
+    Returns:
+        tuple: (index of the farthest interior point, its distance), or
+        (None, 0.0) when there are no interior points
+    """
+    if end - start < 2:
+        return None, 0.0
+    
+    a = xy[start]
+    ab = xy[end] - a
+    ap = xy[start + 1:end] - a
+    
+    length_sq = float(ab @ ab)
+    if length_sq == 0:
+        # Closed loop: measure from the shared end point
+        distances = np.hypot(ap[:, 0], ap[:, 1])
+    else:
+        t = np.clip(ap @ ab / length_sq, 0.0, 1.0)
+        offsets = ap - np.outer(t, ab)
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    
+    farthest = int(np.argmax(distances))
+    return start + 1 + farthest, float(distances[farthest])
+
+def simplify_tolerance(points, tolerance_m=10.0):
+    """
+    Douglas-Peucker simplification with a tolerance in meters
+    
+    Points are projected to a local metric plane first, so the tolerance
+    means the same on the ground at every latitude. Ranges are processed
+    from an explicit stack and each deviation scan is one array operation.
+    
+    Returns:
+        ndarray: Sorted indices of the points to keep (always first and last)
+    """
+    xy = project_to_plane(points)
+    n = len(xy)
+    if n <= 2:
+        return np.arange(n)
+    
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        index, deviation = _segment_deviation(xy, start, end)
+        if index is not None and deviation > tolerance_m:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    
+    return np.flatnonzero(keep)
+
+def simplify_to_count(points, target_points):
+    """
+    Douglas-Peucker simplification down to a fixed number of points
+    
+    Instead of a tolerance, the point that deviates most from the current
+    simplified line is added next, using a priority queue over the open
+    ranges, until target_points are kept. Points on curves and turns are
+    therefore kept before points on straight stretches, and the result is
+    the same for the same input.
+    
+    Returns:
+        ndarray: Sorted indices of the points to keep (always first and last)
+    """
+    xy = project_to_plane(points)
+    n = len(xy)
+    if n <= max(target_points, 2):
+        return np.arange(n)
+    
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    kept = 2
+    
+    # Max-heap on deviation; ties broken by position for determinism
+    heap = []
+    
+    def push(start, end):
+        index, deviation = _segment_deviation(xy, start, end)
+        if index is not None:
+            heapq.heappush(heap, (-deviation, index, start, end))
+    
+    push(0, n - 1)
+    while heap and kept < target_points:
+        _, index, start, end = heapq.heappop(heap)
+        keep[index] = True
+        kept += 1
+        push(start, index)
+        push(index, end)
+    
+    return np.flatnonzero(keep)
@@ -0,0 +1,136 @@
+import numpy as np
+import logging
+from .geo import as_points, project_to_plane
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+FILTER_MODES = ('bbox', 'polygon', 'corridor')
+
+# Corridor half-width used when none is given
+DEFAULT_CORRIDOR_WIDTH_M = 2000
+
+def bbox_mask(points, bounds):
+    """Mask of points inside the box spanned by the from/to corners of bounds"""
+    points = as_points(points)
+    min_lat, max_lat = sorted((bounds['from_lat'], bounds['to_lat']))
+    min_lng, max_lng = sorted((bounds['from_lng'], bounds['to_lng']))
+    
+    lats, lngs = points[:, 0], points[:, 1]
+    return (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+
+def polygon_mask(points, polygon):
+    """
+    Mask of points inside a polygon of [lat, lng] vertices (even-odd rule)
+    
+    The ray-casting test runs once per polygon edge over all points at
+    once, so the cost is O(points x vertices) array work with no Python
+    loop over points. The polygon is closed automatically.
+    """
+    points = as_points(points)
+    vertices = as_points(polygon)
+    inside = np.zeros(len(points), dtype=bool)
+    if len(vertices) < 3 or len(points) == 0:
+        return inside
+    
+    lats, lngs = points[:, 0], points[:, 1]
+    for (lat1, lng1), (lat2, lng2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        if lat1 == lat2:
+            continue
+        # Edges that straddle each point's latitude, crossed east of the point
+        straddles = (lat1 > lats) != (lat2 > lats)
+        crossing_lng = lng1 + (lats - lat1) * (lng2 - lng1) / (lat2 - lat1)
+        inside ^= straddles & (lngs < crossing_lng)
+    
+    return inside
+
+def corridor_mask(points, start, end, width_m=DEFAULT_CORRIDOR_WIDTH_M):
+    """
+    Mask of points within width_m meters of the straight line from start to end
+    
+    Distances are measured to the segment (with round caps at both ends)
+    in a local metric plane centred between start and end.
+    """
+    points = as_points(points)
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    
+    origin_lat = (start[0] + end[0]) / 2
+    xy = project_to_plane(points, origin_lat)
+    a, b = project_to_plane([start, end], origin_lat)
+    
+    ab = b - a
+    ap = xy - a
+    length_sq = float(ab @ ab)
+    t = np.clip(ap @ ab / length_sq, 0.0, 1.0) if length_sq > 0 else np.zeros(len(xy))
+    offsets = ap - np.outer(t, ab)
+    
+    return np.hypot(offsets[:, 0], offsets[:, 1]) <= width_m
+
+def bounds_mask(points, bounds):
+    """
+    Mask of points selected by bounds
+    
+    bounds holds the from/to corners plus an optional ``filter_mode``:
+    'bbox' (default) keeps the box between the corners, 'polygon' keeps
+    points inside ``bounds['polygon']`` and 'corridor' keeps points within
+    ``bounds['corridor_width_m']`` of the from->to line.
+    """
+    mode = bounds.get('filter_mode') or 'bbox'
+    
+    if mode == 'polygon':
+        return polygon_mask(points, bounds.get('polygon') or [])
+    if mode == 'corridor':
+        return corridor_mask(
+            points,
+            (bounds['from_lat'], bounds['from_lng']),
+            (bounds['to_lat'], bounds['to_lng']),
+            bounds.get('corridor_width_m') or DEFAULT_CORRIDOR_WIDTH_M
+        )
+    if mode != 'bbox':
+        logger.warning(f"Unknown filter mode '{mode}', using 'bbox'")
+    return bbox_mask(points, bounds)
+
+def canonical_bounds(bounds):
+    """
+    The parts of bounds that affect filtering, rounded for use in cache keys
+    
+    Plain bounding boxes give the same result as before filter modes
+    existed, so their cached analyses stay valid.
+    """
+    canonical = {k: round(float(bounds[k]), 6) for k in ('from_lat', 'from_lng', 'to_lat', 'to_lng')}
+    mode = bounds.get('filter_mode') or 'bbox'
+    
+    if mode == 'polygon':
+        canonical['filter_mode'] = mode
+        canonical['polygon'] = np.round(as_points(bounds.get('polygon') or []), 6).tolist()
+    elif mode == 'corridor':
+        canonical['filter_mode'] = mode
+        canonical['corridor_width_m'] = round(float(bounds.get('corridor_width_m') or DEFAULT_CORRIDOR_WIDTH_M), 1)
+    
+    return canonical
+
+def parse_polygon(text):
+    """
+    Parse polygon vertices from "lat,lng; lat,lng; ..." text
+    
+    Returns:
+        list: [lat, lng] pairs
+    
+    Raises:
+        ValueError: If a vertex is malformed or out of range, or fewer than
+        3 vertices are given
+    """
+    vertices = []
+    for part in (text or '').replace('\n', ';').split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        lat, lng = (float(v) for v in part.split(','))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Vertex out of range: {part}")
+        vertices.append([lat, lng])
+    
+    if len(vertices) < 3:
+        raise ValueError("A polygon needs at least 3 vertices")
+    return vertices
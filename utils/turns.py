@@ -0,0 +1,100 @@
+import numpy as np
+import logging
+from .geo import as_points, cumulative_distance_m, initial_bearing
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+def _interpolate(stations, cumulative, points):
+    """Positions at the given distances along a path"""
+    return np.column_stack((np.interp(stations, cumulative, points[:, 0]),
+                            np.interp(stations, cumulative, points[:, 1])))
+
+def turn_angles(points, spacing_m=10.0, window_m=30.0):
+    """
+    Heading change along a path, sampled at a fixed spacing in meters
+    
+    Stations are placed every spacing_m meters and at every vertex (so
+    corners are measured exactly). The angle at a station is between the
+    bearing over the window_m meters leading into it and the bearing over
+    the window_m meters leaving it, wrapped to [-180, 180] (positive is a
+    right turn). Stations closer than window_m to either end get 0.
+    
+    Returns:
+        tuple: (station distances in meters, float64 (M, 2) station
+        positions, heading change in degrees, index of the nearest vertex
+        for each station)
+    """
+    points = as_points(points)
+    
+    # Drop repeated points so the distance axis is strictly increasing
+    if len(points):
+        distinct = np.flatnonzero(np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)])
+    else:
+        distinct = np.zeros(0, dtype=int)
+    points = points[distinct]
+    cumulative = cumulative_distance_m(points)
+    total = float(cumulative[-1]) if len(cumulative) else 0.0
+    if total == 0:
+        return np.zeros(0), np.empty((0, 2)), np.zeros(0), np.zeros(0, dtype=int)
+    
+    stations = np.union1d(np.arange(0, total, spacing_m), cumulative)
+    positions = _interpolate(stations, cumulative, points)
+    behind = _interpolate(stations - window_m, cumulative, points)
+    ahead = _interpolate(stations + window_m, cumulative, points)
+    
+    incoming = initial_bearing(behind, positions)
+    outgoing = initial_bearing(positions, ahead)
+    angles = (outgoing - incoming + 180) % 360 - 180
+    angles[(stations < window_m) | (stations > total - window_m)] = 0.0
+    
+    # Nearest original vertex to each station
+    after = np.clip(np.searchsorted(cumulative, stations), 1, max(len(cumulative) - 1, 1))
+    before = after - 1
+    nearest = np.where(stations - cumulative[before] <= cumulative[after] - stations, before, after)
+    
+    return stations, positions, angles, distinct[nearest]
+
+def find_sharp_turns(points, angle_threshold=30, spacing_m=10.0, window_m=30.0):
+    """
+    Find sharp turns along a route polyline
+    
+    Heading changes are computed for the whole route in one pass by
+    turn_angles(), so results do not depend on how densely the source
+    polyline is sampled. Each run of consecutive stations above
+    angle_threshold is one turn, reported at its sharpest station.
+    
+    Args:
+        points: (N, 2) array or list of [lat, lng]
+        angle_threshold (float): Minimum heading change in degrees
+        spacing_m (float): Station spacing in meters
+        window_m (float): Distance before and after each station over which
+            the heading change is measured
+    
+    Returns:
+        list: Dicts with lat, lng, angle (degrees) and index (nearest
+        vertex of the input polyline)
+    """
+    _, positions, angles, vertex_index = turn_angles(points, spacing_m, window_m)
+    
+    angles = np.abs(angles)
+    sharp_indices = np.flatnonzero(angles >= angle_threshold)
+    if len(sharp_indices) == 0:
+        return []
+    
+    # Split the above-threshold stations into runs and keep each run's peak
+    run_starts = np.flatnonzero(np.r_[True, np.diff(sharp_indices) > 1])
+    run_ends = np.r_[run_starts[1:], len(sharp_indices)]
+    
+    sharp_turns = []
+    for start, end in zip(run_starts, run_ends):
+        run = sharp_indices[start:end]
+        peak = run[np.argmax(angles[run])]
+        sharp_turns.append({
+            'lat': float(positions[peak, 0]),
+            'lng': float(positions[peak, 1]),
+            'angle': round(float(angles[peak]), 2),
+            'index': int(vertex_index[peak])
+        })
+    
+    return sharp_turns
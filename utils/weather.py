@@ -0,0 +1,169 @@
+import concurrent.futures
+import threading
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app, has_app_context
+from config import Config
+from .cache import SQLiteCache
+from .geo import geohash
+from .rate_limit import RateLimitTimeout, get_bucket, get_with_retry
+from .api_transport import get_transport_session, is_offline
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# (connect, read) seconds; a slow upstream fails the request instead of
+# holding the worker
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Connections kept alive to the weather host, shared by all threads
+POOL_SIZE = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_session():
+    """Get the process-wide keep-alive session used for weather requests"""
+    global _session
+    transport = get_transport_session()
+    if transport is not None:
+        return transport
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def fetch_current_weather(lat, lng, api_key, timeout=DEFAULT_TIMEOUT):
+    """
+    Current weather at one point from OpenWeather
+    
+    The request is rate limited and retried on throttling or server errors.
+    
+    Returns:
+        dict: lat, lng, location, temp, description and icon, or None if
+        the request failed
+    
+    Raises:
+        RateLimitTimeout: If the OpenWeather quota left no capacity for the request
+    """
+    try:
+        response = get_with_retry(
+            OPENWEATHER_URL,
+            bucket=get_bucket('openweather'),
+            session=get_session(),
+            params={'lat': lat, 'lon': lng, 'appid': api_key, 'units': 'metric'},
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            logger.warning(f"Weather API returned {response.status_code} for ({lat}, {lng})")
+            return None
+        
+        data = response.json()
+        return {
+            "lat": lat,
+            "lng": lng,
+            "location": data.get("name") or f"{lat:.3f},{lng:.3f}",
+            "temp": data['main']['temp'],
+            "description": data['weather'][0]['description'],
+            "icon": data['weather'][0]['icon']
+        }
+    except RateLimitTimeout:
+        raise
+    except Exception as e:
+        logger.warning(f"Weather fetch error at ({lat}, {lng}): {e}")
+        return None
+
+def _cache_settings():
+    """Weather cache settings from the app config, or the base config outside an app"""
+    source = current_app.config if has_app_context() else {
+        name: getattr(Config, name) for name in dir(Config) if name.startswith('WEATHER_CACHE')
+    }
+    return {name: source.get(name) for name in (
+        'WEATHER_CACHE_ENABLED', 'WEATHER_CACHE_PATH', 'WEATHER_CACHE_MAX_ENTRIES',
+        'WEATHER_CACHE_GEOHASH_PRECISION', 'WEATHER_CACHE_TTL'
+    )}
+
+def get_weather_cache(settings=None):
+    """Get the weather cache shared by all workers on the host, or None if disabled"""
+    settings = settings or _cache_settings()
+    if not settings['WEATHER_CACHE_ENABLED']:
+        return None
+    
+    path = settings['WEATHER_CACHE_PATH']
+    cache = _caches.get(path)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(path)
+            if cache is None:
+                cache = SQLiteCache(path, namespace='weather', max_entries=settings['WEATHER_CACHE_MAX_ENTRIES'])
+                _caches[path] = cache
+    return cache
+
+def weather_cell_key(lat, lng, precision, ttl, now=None):
+    """
+    Cache key for weather at a point: its geohash cell and time bucket
+    
+    Buckets are ttl seconds long and aligned to the epoch, so every request
+    in the same cell and bucket shares one observation.
+    """
+    bucket = int((now or time.time()) // ttl)
+    return f"{geohash(lat, lng, precision)}:{bucket}"
+
+def get_weather_for_points(points, api_key, timeout=DEFAULT_TIMEOUT, max_workers=4):
+    """
+    Current weather at several points, fetched concurrently
+    
+    Observations are shared through the weather cache by geohash cell and
+    time bucket (WEATHER_CACHE_GEOHASH_PRECISION, WEATHER_CACHE_TTL), so
+    points in a cell that any route has asked about in the current bucket
+    are served locally, and only one request is made per uncached cell.
+    All requests go through the shared keep-alive session. Points whose
+    weather could not be fetched are left out; the rest are returned in
+    input order, each with its own lat/lng.
+    """
+    points = [(float(point[0]), float(point[1])) for point in points]
+    if not points:
+        return []
+    if not api_key and not is_offline():
+        logger.warning("No OpenWeather API key configured, skipping weather")
+        return []
+    
+    settings = _cache_settings()
+    cache = get_weather_cache(settings)
+    precision = settings['WEATHER_CACHE_GEOHASH_PRECISION']
+    ttl = settings['WEATHER_CACHE_TTL']
+    
+    now = time.time()
+    keys = [weather_cell_key(lat, lng, precision, ttl, now) for lat, lng in points]
+    found = cache.get_many(keys) if cache else {}
+    
+    # One request per uncached cell, made at the first point that falls in it
+    missing = {}
+    for key, point in zip(keys, points):
+        if key not in found and key not in missing:
+            missing[key] = point
+    
+    if missing:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+            results = executor.map(lambda point: fetch_current_weather(point[0], point[1], api_key, timeout),
+                                   missing.values())
+            fetched = {key: weather for key, weather in zip(missing, results) if weather}
+        
+        if cache and fetched:
+            # Entries expire with their bucket
+            cache.set_many(fetched, ttl=max(1, (int(now // ttl) + 1) * ttl - now))
+        found.update(fetched)
+    
+    return [dict(found[key], lat=lat, lng=lng) for key, (lat, lng) in zip(keys, points) if key in found]